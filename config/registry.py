@@ -0,0 +1,76 @@
+"""
+Declarative sensor registry loaded from config/sensors.yaml
+"""
+from typing import List, Optional
+from pydantic import BaseModel
+import yaml
+from config.settings import Settings
+from utils.decoders import FRAME_DECODERS, MESSAGE_DECODERS
+
+PROTOCOLS = ('tcp', 'udp', 'http', 'mqtt')
+PRIORITIES = ('low', 'normal', 'high')
+
+class SensorConfig(BaseModel):
+    name: str
+    protocol: str
+    host: Optional[str] = None
+    port: Optional[int] = None
+    path: Optional[str] = None
+    field: Optional[str] = None
+    topic: Optional[str] = None
+    decoder: str = 'float32'
+    rate: float = 100.0
+    storage: Optional[str] = None
+    database_url: Optional[str] = None
+    priority: str = 'normal'
+    rollup: bool = False
+    
+    @property
+    def storage_target(self) -> str:
+        return self.storage or self.name
+    
+    @property
+    def channels(self) -> bool:
+        """Whether readings carry a value_type channel (multi-axis sensors)"""
+        return self.decoder == 'imu_json'
+
+def validate_sensor(sensor: SensorConfig):
+    """Check protocol-specific fields, raising ValueError on bad entries"""
+    if sensor.protocol not in PROTOCOLS:
+        raise ValueError(f"Sensor {sensor.name}: unknown protocol '{sensor.protocol}'")
+    if sensor.priority not in PRIORITIES:
+        raise ValueError(f"Sensor {sensor.name}: priority must be one of {PRIORITIES}")
+    
+    if sensor.protocol in MESSAGE_DECODERS:
+        if sensor.decoder not in MESSAGE_DECODERS[sensor.protocol]:
+            raise ValueError(f"Sensor {sensor.name}: decoder '{sensor.decoder}' "
+                             f"is not supported over {sensor.protocol}")
+    elif sensor.decoder not in FRAME_DECODERS:
+        raise ValueError(f"Sensor {sensor.name}: unknown decoder '{sensor.decoder}'")
+    
+    if sensor.protocol in ('tcp', 'udp') and sensor.port is None:
+        raise ValueError(f"Sensor {sensor.name}: port is required for {sensor.protocol}")
+    if sensor.protocol == 'http' and not (sensor.path and sensor.field):
+        raise ValueError(f"Sensor {sensor.name}: path and field are required for http")
+    if sensor.protocol == 'mqtt' and not sensor.topic:
+        raise ValueError(f"Sensor {sensor.name}: topic is required for mqtt")
+
+def load_registry(path: str = None) -> List[SensorConfig]:
+    """
+    Load and validate the sensor registry
+    
+    Args:
+        path (str, optional): YAML file, defaults to Settings.SENSOR_REGISTRY
+        
+    Returns:
+        list: SensorConfig for every declared sensor
+    """
+    with open(path or Settings.SENSOR_REGISTRY) as f:
+        document = yaml.safe_load(f) or {}
+    
+    sensors = []
+    for name, entry in (document.get('sensors') or {}).items():
+        sensor = SensorConfig(name=name, **(entry or {}))
+        validate_sensor(sensor)
+        sensors.append(sensor)
+    return sensors
@@ -4,11 +4,11 @@ Main application entry point with real-time visualization
 import threading
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
-from services.tcp_service import TCPServer
-from services.mqtt_service import IMUClient
-from services.http_service import start_fastapi
+from services.collector import Collector
 from utils.data_buffer import DataBuffer
 from services.database_service import DatabaseService
+from services.compaction_service import CompactionService
+from services.spool import Spool, SpoolReplayer
 
 class SensorPlotter:
     def __init__(self, data_buffer: DataBuffer):
@@ -89,24 +89,27 @@ class SensorPlotter:
 def main():
     # Initialize services
     data_buffer = DataBuffer()
-    db_service = DatabaseService()
+    spool = Spool()
+    db_service = DatabaseService(spool=spool)
     
     # Initialize visualization
     plotter = SensorPlotter(data_buffer)
     
-    # Start TCP servers
-    temp_server = TCPServer("temperature", data_buffer, db_service)
-    gas_server = TCPServer("gas", data_buffer, db_service)
+    # Sensor listeners from config/sensors.yaml, all on one event loop
+    collector = Collector(data_buffer, db_service)
     
-    # Start MQTT client
-    imu_client = IMUClient(data_buffer, db_service)
+    # Replays spooled readings once the databases recover
+    spool_replayer = SpoolReplayer(spool, db_service)
+    
+    # Start cold-tier compaction
+    compaction_service = CompactionService(db_service)
     
     # Create and start threads for services (excluding visualization)
     threads = [
-        threading.Thread(target=temp_server.run),
-        threading.Thread(target=gas_server.run),
-        threading.Thread(target=imu_client.run),
-        threading.Thread(target=start_fastapi, args=(data_buffer, db_service))
+        threading.Thread(target=collector.run),
+        threading.Thread(target=spool_replayer.run),
+        threading.Thread(target=compaction_service.run),
+        threading.Thread(target=db_service.run_partition_maintenance)
     ]
     
     # Start all service threads
@@ -1,10 +1,15 @@
 """
 SQLAlchemy models for different sensor databases
 """
-from sqlalchemy import Column, Integer, Float, DateTime, String
+from sqlalchemy import Column, Integer, BigInteger, Float, DateTime, String, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
+# Readings tables are range-partitioned on timestamp (see DatabaseService),
+# so the partition key has to be part of the primary key. Reading ids are
+# BIGINT: high-rate sensors exhaust a 32-bit sequence within months. Tables
+# created with INTEGER ids need ALTER TABLE readings ALTER COLUMN id TYPE bigint.
+
 # Create separate base classes for each database
 HumidityBase = declarative_base()
 TemperatureBase = declarative_base()
@@ -13,25 +18,103 @@ IMUBase = declarative_base()
 
 class HumidityReading(HumidityBase):
     __tablename__ = "readings"
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = {'postgresql_partition_by': 'RANGE (timestamp)'}
+    id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
     value = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
 
 class TemperatureReading(TemperatureBase):
     __tablename__ = "readings"
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = {'postgresql_partition_by': 'RANGE (timestamp)'}
+    id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
     value = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
 
 class GasReading(GasBase):
     __tablename__ = "readings"
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = {'postgresql_partition_by': 'RANGE (timestamp)'}
+    id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
     value = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
 
 class IMUReading(IMUBase):
     __tablename__ = "readings"
-    id = Column(Integer, primary_key=True, index=True)
-    value_type = Column(String)  # 'acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (timestamp)'}
+    id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
+    value_type = Column(String)  # 'acc_x', ..., 'gyro_z', and fused 'roll', 'pitch', 'yaw'
     value = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
+
+# Compressed cold-tier blocks, one table per database alongside readings.
+# channel is 'value' for single-value sensors and the IMU value_type otherwise.
+class HumidityBlock(HumidityBase):
+    __tablename__ = "reading_blocks"
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String, index=True)
+    start_time = Column(DateTime, index=True)
+    end_time = Column(DateTime, index=True)
+    count = Column(Integer)
+    data = Column(LargeBinary)
+
+class TemperatureBlock(TemperatureBase):
+    __tablename__ = "reading_blocks"
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String, index=True)
+    start_time = Column(DateTime, index=True)
+    end_time = Column(DateTime, index=True)
+    count = Column(Integer)
+    data = Column(LargeBinary)
+
+class GasBlock(GasBase):
+    __tablename__ = "reading_blocks"
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String, index=True)
+    start_time = Column(DateTime, index=True)
+    end_time = Column(DateTime, index=True)
+    count = Column(Integer)
+    data = Column(LargeBinary)
+
+class IMUBlock(IMUBase):
+    __tablename__ = "reading_blocks"
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String, index=True)
+    start_time = Column(DateTime, index=True)
+    end_time = Column(DateTime, index=True)
+    count = Column(Integer)
+    data = Column(LargeBinary)
+
+def create_reading_models(name: str, channels: bool = False):
+    """
+    Build a Base, reading model and block model for a registry-declared database
+    
+    Args:
+        name (str): Storage target name, used for class names
+        channels (bool): Whether readings carry a value_type column
+        
+    Returns:
+        tuple: (Base, Reading, Block)
+    """
+    base = declarative_base()
+    prefix = ''.join(part.title() for part in name.split('_'))
+    
+    reading_attrs = {
+        '__tablename__': "readings",
+        '__table_args__': {'postgresql_partition_by': 'RANGE (timestamp)'},
+        'id': Column(BigInteger, primary_key=True, autoincrement=True, index=True),
+        'value': Column(Float),
+        'timestamp': Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
+    }
+    if channels:
+        reading_attrs['value_type'] = Column(String)
+    reading = type(f"{prefix}Reading", (base,), reading_attrs)
+    
+    block = type(f"{prefix}Block", (base,), {
+        '__tablename__': "reading_blocks",
+        'id': Column(Integer, primary_key=True, index=True),
+        'channel': Column(String, index=True),
+        'start_time': Column(DateTime, index=True),
+        'end_time': Column(DateTime, index=True),
+        'count': Column(Integer),
+        'data': Column(LargeBinary)
+    })
+    return base, reading, block
\ No newline at end of file
@@ -12,16 +12,32 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class GasSender:
-    def __init__(self, host="192.168.0.162", port=5010):
+    def __init__(self, host="192.168.0.162", port=5010, protocol="tcp", interval=0.01):
+        """
+        Args:
+            host (str): Server address
+            port (int): Server port
+            protocol (str): "tcp" for a stream of floats, "udp" for sequenced datagrams
+            interval (float): Seconds between readings; 0 sends as fast as possible
+                and logs throughput instead of every reading
+        """
         self.host = host
         self.port = port
+        self.protocol = protocol
+        self.interval = interval
         self.sock = None
         self.connected = False
+        self.sequence = 0
+        self.sent = 0
+        self.rate_started = time.time()
         
     def connect(self):
-        """Establish TCP connection with server"""
+        """Establish TCP connection (or UDP socket) with server"""
         try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if self.protocol == "udp":
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            else:
+                self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect((self.host, self.port))
             self.connected = True
             logger.info(f"Connected to server at {self.host}:{self.port}")
@@ -42,6 +58,14 @@ class GasSender:
             variation = random.uniform(-20.0, 20.0)  # Normal variation
         return max(0, base_level + variation)
         
+    def report_rate(self):
+        """Log readings sent per second"""
+        elapsed = time.time() - self.rate_started
+        if elapsed >= 1.0:
+            logger.info(f"{self.protocol.upper()} throughput: {self.sent / elapsed:.0f} readings/s")
+            self.sent = 0
+            self.rate_started = time.time()
+            
     def send_data(self):
         """Send gas sensor data to server"""
         while True:
@@ -54,10 +78,19 @@ class GasSender:
                 gas_level = self.simulate_gas_reading()
                 # Pack float to bytes
                 data = struct.pack('f', gas_level)
-                self.sock.sendall(data)
+                if self.protocol == "udp":
+                    # Sequence number lets the server account for lost datagrams
+                    self.sock.send(struct.pack('!I', self.sequence) + data)
+                    self.sequence = (self.sequence + 1) % (1 << 32)
+                else:
+                    self.sock.sendall(data)
+                self.sent += 1
                 
-                logger.info(f"{datetime.now()} - Sent gas level: {gas_level:.2f} PPM")
-                time.sleep(0.01)  # 100 hz
+                if self.interval:
+                    logger.info(f"{datetime.now()} - Sent gas level: {gas_level:.2f} PPM")
+                    time.sleep(self.interval)  # 100 hz by default
+                else:
+                    self.report_rate()
                 
             except Exception as e:
                 logger.error(f"Error sending data: {e}")
@@ -1,6 +1,7 @@
 """
 Script to run all sensor senders
 """
+import argparse
 import threading
 from temperature_sensor import TemperatureSender
 from gas_sensor import GasSender
@@ -9,9 +10,16 @@ from imu_sensor import IMUSender
 import time
 
 def main():
+    parser = argparse.ArgumentParser(description="Run all sensor senders")
+    parser.add_argument("--protocol", choices=["tcp", "udp"], default="tcp",
+                        help="Transport for the temperature and gas senders")
+    parser.add_argument("--interval", type=float, default=0.01,
+                        help="Seconds between temperature/gas readings (0 = as fast as possible)")
+    args = parser.parse_args()
+    
     # Initialize senders
-    temp_sender = TemperatureSender()
-    gas_sender = GasSender()
+    temp_sender = TemperatureSender(protocol=args.protocol, interval=args.interval)
+    gas_sender = GasSender(protocol=args.protocol, interval=args.interval)
     humidity_sender = HumiditySender()
     imu_sender = IMUSender()
 
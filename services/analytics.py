@@ -0,0 +1,248 @@
+"""
+Cross-sensor time alignment
+
+Channels arrive at different rates with timestamps that never line up; they
+are resampled onto one common grid with numpy searchsorted over the sorted
+timestamps, so no Python runs per row however long the range.
+"""
+from datetime import datetime
+import numpy as np
+from config.settings import Settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('asof', 'nearest', 'linear')
+SOURCES = ('storage', 'buffer')
+
+def parse_channel(spec: str) -> tuple:
+    """
+    Split a channel spec into database and value type
+
+    'temperature' -> ('temperature', None), 'imu.acc_x' -> ('imu', 'acc_x')
+    """
+    sensor_type, _, value_type = spec.partition('.')
+    return sensor_type, value_type or None
+
+def to_micros(times) -> np.ndarray:
+    return np.asarray(times, dtype='datetime64[us]').astype(np.int64)
+
+def resample(times: np.ndarray, values: np.ndarray, grid: np.ndarray,
+             method: str, tolerance: int) -> np.ndarray:
+    """
+    Resample one channel onto a grid
+
+    Args:
+        times (np.ndarray): Sorted sample times, int64 microseconds
+        values (np.ndarray): Sample values
+        grid (np.ndarray): Grid times, int64 microseconds
+        method (str): 'asof' (last sample at or before), 'nearest' or 'linear'
+        tolerance (int): Furthest a sample may be from a grid point, microseconds;
+            'linear' needs a sample within it on both sides
+
+    Returns:
+        np.ndarray: float64 values on the grid, NaN where no sample qualifies
+    """
+    result = np.full(len(grid), np.nan)
+    count = len(times)
+    if count == 0:
+        return result
+
+    if method == 'asof':
+        index = np.searchsorted(times, grid, side='right') - 1
+        valid = index >= 0
+        index = np.maximum(index, 0)
+        valid &= grid - times[index] <= tolerance
+        result[valid] = values[index[valid]]
+
+    elif method == 'nearest':
+        right = np.searchsorted(times, grid, side='left')
+        left = np.maximum(right - 1, 0)
+        right = np.minimum(right, count - 1)
+        index = np.where(times[right] - grid < grid - times[left], right, left)
+        valid = np.abs(times[index] - grid) <= tolerance
+        result[valid] = values[index[valid]]
+
+    elif method == 'linear':
+        right = np.searchsorted(times, grid, side='left')
+        inside = right < count
+        left = np.maximum(right - 1, 0)
+        right = np.minimum(right, count - 1)
+        exact = inside & (times[right] == grid)
+        bracketed = (inside & (times[left] <= grid)
+                     & (grid - times[left] <= tolerance) & (times[right] - grid <= tolerance))
+        valid = exact | bracketed
+        result[valid] = np.interp(grid[valid].astype(np.float64),
+                                  times.astype(np.float64), values)
+
+    else:
+        raise ValueError(f"method must be one of {METHODS}")
+
+    return result
+
+class AlignedTable:
+    def __init__(self, grid: np.ndarray, columns: dict):
+        """
+        Args:
+            grid (np.ndarray): Row times, int64 microseconds
+            columns (dict): Channel name -> float64 values, NaN where missing
+        """
+        self.grid = grid
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.grid)
+
+    def timestamps(self) -> np.ndarray:
+        return self.grid.astype('datetime64[us]')
+
+    def to_dict(self) -> dict:
+        """JSON-ready columns; missing values become None"""
+        columns, coverage = {}, {}
+        for name, values in self.columns.items():
+            missing = np.isnan(values)
+            coverage[name] = float(1 - missing.mean()) if len(values) else 0.0
+            columns[name] = np.where(missing, None, values).tolist()
+        return {
+            'timestamp': np.datetime_as_string(self.timestamps()).tolist(),
+            'columns': columns,
+            'coverage': coverage
+        }
+
+def align(series: dict, grid: np.ndarray, method: str, tolerance: int) -> AlignedTable:
+    """
+    Resample every channel onto the same grid
+
+    Args:
+        series (dict): Channel name -> (int64 microsecond times, values), sorted
+        grid (np.ndarray): Grid times, int64 microseconds
+        method (str): See resample
+        tolerance (int): See resample
+
+    Returns:
+        AlignedTable: One row per grid point, one column per channel
+    """
+    return AlignedTable(grid, {
+        name: resample(times, values, grid, method, tolerance)
+        for name, (times, values) in series.items()
+    })
+
+def load_storage(db_service, channels: list, start: datetime, end: datetime) -> dict:
+    """Fetch channels from the databases as sorted arrays"""
+    series = {}
+    for spec in channels:
+        sensor_type, value_type = parse_channel(spec)
+        if sensor_type not in db_service.models:
+            raise ValueError(f"Unknown sensor type {sensor_type}")
+        if db_service.has_channels(sensor_type) and value_type is None:
+            raise ValueError(f"{sensor_type} needs a channel, e.g. {sensor_type}.acc_x")
+        times, values = db_service.get_sensor_series(sensor_type, start, end, value_type)
+        series[spec] = (to_micros(times), values)
+    return series
+
+def load_buffer(data_buffer, channels: list) -> dict:
+    """
+    Fetch channels from the in-memory buffers as sorted arrays
+
+    Buffers holding tuples (acc, gyro, orientation) are split into
+    '<name>.<index>' channels; a spec with an index selects just that one.
+    Buffers mixing scalars and tuples are rejected.
+    """
+    series = {}
+    for spec in channels:
+        name, _, index = spec.partition('.')
+        if name not in data_buffer.buffers:
+            raise ValueError(f"Unknown buffer {name}")
+        timestamps, values = data_buffer.get_series(name)
+        times = np.round(np.array(timestamps, dtype=np.float64) * 1e6).astype(np.int64)
+        try:
+            values = np.array(values, dtype=np.float64)
+        except ValueError:
+            raise ValueError(f"Buffer {name} mixes scalars and tuples")
+        if values.ndim > 2:
+            raise ValueError(f"Buffer {name} holds nested values")
+        order = np.argsort(times, kind='stable')
+        times, values = times[order], values[order]
+
+        if values.ndim == 1:
+            series[name] = (times, values)
+        elif index:
+            series[spec] = (times, values[:, int(index)])
+        else:
+            for i in range(values.shape[1]):
+                series[f"{name}.{i}"] = (times, values[:, i])
+    return series
+
+def make_grid(start: int, end: int, step: int) -> np.ndarray:
+    """Regular grid over [start, end), int64 microseconds"""
+    if step <= 0:
+        raise ValueError("step must be positive")
+    points = -(-(end - start) // step)
+    if points > Settings.ANALYTICS_MAX_POINTS:
+        raise ValueError(f"Grid of {points} points exceeds {Settings.ANALYTICS_MAX_POINTS}; "
+                         "use a larger step or a shorter range")
+    return np.arange(start, end, step, dtype=np.int64)
+
+def align_channels(channels: list, start: datetime = None, end: datetime = None,
+                   step: float = None, method: str = 'asof', tolerance: float = None,
+                   on: str = None, source: str = 'storage', db_service=None,
+                   data_buffer=None) -> AlignedTable:
+    """
+    Load channels and align them into one table
+
+    Args:
+        channels (list): Channel specs, 'temperature' or 'imu.acc_x' for storage,
+            buffer names (optionally 'imu_orientation.0') for the buffer source
+        start (datetime, optional): Inclusive start; required for storage
+        end (datetime, optional): Exclusive end; required for storage
+        step (float, optional): Grid step in seconds
+        method (str): 'asof', 'nearest' or 'linear'
+        tolerance (float, optional): Seconds; defaults to step, else
+            Settings.ANALYTICS_TOLERANCE
+        on (str, optional): Use this channel's own sample times as the grid
+            instead of a regular step
+        source (str): 'storage' or 'buffer'
+        db_service: DatabaseService for the storage source
+        data_buffer: DataBuffer for the buffer source
+
+    Returns:
+        AlignedTable
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if not channels:
+        raise ValueError("At least one channel is required")
+    if (step is None) == (on is None):
+        raise ValueError("Give exactly one of step or on")
+
+    if source == 'storage':
+        if start is None or end is None:
+            raise ValueError("start and end are required for storage queries")
+        series = load_storage(db_service, channels, start, end)
+    elif source == 'buffer':
+        series = load_buffer(data_buffer, channels)
+    else:
+        raise ValueError(f"source must be one of {SOURCES}")
+
+    if on is not None:
+        if on not in series:
+            raise ValueError(f"on must be one of the requested channels {list(series)}")
+        grid = series[on][0]
+        if start is not None:
+            grid = grid[grid >= to_micros(start)]
+        if end is not None:
+            grid = grid[grid < to_micros(end)]
+        if len(grid) > Settings.ANALYTICS_MAX_POINTS:
+            raise ValueError(f"Grid of {len(grid)} points exceeds {Settings.ANALYTICS_MAX_POINTS}")
+    else:
+        first = [times[0] for times, _ in series.values() if len(times)]
+        last = [times[-1] for times, _ in series.values() if len(times)]
+        grid_start = to_micros(start) if start is not None else min(first, default=0)
+        grid_end = to_micros(end) if end is not None else max(last, default=-1) + 1
+        grid = make_grid(int(grid_start), int(grid_end), int(round(step * 1e6)))
+
+    if tolerance is None:
+        tolerance = step if step is not None else Settings.ANALYTICS_TOLERANCE
+    table = align(series, grid, method, int(round(tolerance * 1e6)))
+    logger.debug(f"Aligned {len(series)} channels onto {len(table)} points ({method})")
+    return table
@@ -0,0 +1,221 @@
+"""
+Read API served by the collector process
+"""
+import asyncio
+import hmac
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+import logging
+from config.settings import Settings
+from services.analytics import align_channels
+from services.export_service import FORMATS, export_readings, naive_utc, open_csv
+from services.profiling import Profiler
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class SnapshotService:
+    def __init__(self, app: FastAPI, cache):
+        """
+        Register the latest-value snapshot endpoint
+
+        Args:
+            app: FastAPI application to register the route on
+            cache: LatestValueCache fed by the ingest path
+        """
+        self.cache = cache
+        app.add_api_route("/snapshot", self.snapshot, methods=["GET"])
+
+    async def snapshot(self, request: Request, channels: Optional[str] = None,
+                       wait: float = 0.0):
+        """
+        Latest value, timestamp and recent window of every channel
+
+        Clients send the previous ETag in If-None-Match; with wait > 0 the
+        request is held until the next change (or the timeout) instead of
+        answering 304 straight away.
+        """
+        names = channels.split(',') if channels else None
+        wait = min(max(wait, 0.0), Settings.SNAPSHOT_MAX_WAIT)
+
+        version, body = self.cache.snapshot(names)
+        if request.headers.get('if-none-match') == self.cache.etag(version):
+            if wait and await self.cache.wait_for_change(version, wait, names):
+                version, body = self.cache.snapshot(names)
+            else:
+                return Response(status_code=304, headers={'ETag': self.cache.etag(version)})
+
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={'ETag': self.cache.etag(version), 'Cache-Control': 'no-cache'}
+        )
+
+class MetricsService:
+    def __init__(self, app: FastAPI):
+        """Register the metrics endpoint"""
+        app.add_api_route("/metrics", self.get_metrics, methods=["GET"])
+
+    async def get_metrics(self):
+        """Counters and gauges of the collector process"""
+        return metrics.snapshot()
+
+class ExportService:
+    def __init__(self, app: FastAPI, db_service):
+        """Register the bulk export endpoint"""
+        self.db_service = db_service
+        app.add_api_route("/export/{sensor_type}", self.export, methods=["GET"])
+
+    async def export(self, sensor_type: str, start: datetime, end: datetime,
+                     format: str = "csv", value_type: Optional[str] = None):
+        """
+        Stream a sensor's readings for [start, end) as CSV, Parquet or NPY
+
+        CSV is streamed chunk by chunk; Parquet and NPY are written incrementally
+        to a temporary file (NPY needs its row count in the header) and sent from disk.
+        """
+        # Timestamps are stored as naive UTC; '...Z' or '+02:00' parse as aware
+        start, end = naive_utc(start), naive_utc(end)
+        if sensor_type not in self.db_service.models:
+            raise HTTPException(status_code=404, detail=f"Unknown sensor type {sensor_type}")
+        if format not in FORMATS:
+            raise HTTPException(status_code=422, detail=f"format must be one of {FORMATS}")
+        if start >= end:
+            raise HTTPException(status_code=422, detail="start must be before end")
+
+        filename = f"{sensor_type}-{start:%Y%m%dT%H%M%S}-{end:%Y%m%dT%H%M%S}.{format}"
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+
+        if format == "csv":
+            try:
+                chunks = await asyncio.to_thread(open_csv, self.db_service, sensor_type,
+                                                 start, end, value_type)
+            except self.db_service.UNAVAILABLE_ERRORS as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            return StreamingResponse(chunks, media_type="text/csv", headers=headers)
+
+        fd, path = tempfile.mkstemp(suffix=f".{format}")
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                await asyncio.to_thread(export_readings, self.db_service, sensor_type,
+                                        start, end, format, output, value_type)
+        except self.db_service.UNAVAILABLE_ERRORS as e:
+            os.remove(path)
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            os.remove(path)
+            logger.error(f"Error exporting {sensor_type}: {e}")
+            raise HTTPException(status_code=500, detail=f"Error exporting {sensor_type}")
+
+        return FileResponse(
+            path,
+            media_type="application/octet-stream",
+            headers=headers,
+            background=BackgroundTask(os.remove, path)
+        )
+
+class AnalyticsService:
+    def __init__(self, app: FastAPI, data_buffer, db_service):
+        """Register the cross-sensor alignment endpoint"""
+        self.data_buffer = data_buffer
+        self.db_service = db_service
+        app.add_api_route("/analytics/align", self.align, methods=["GET"])
+
+    async def align(self, channels: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, step: Optional[float] = None,
+                    method: str = "asof", tolerance: Optional[float] = None,
+                    on: Optional[str] = None, source: str = "storage"):
+        """
+        Resample several channels onto one time grid and return them as one table
+
+        channels is comma separated ('temperature,gas,imu.acc_x'); the grid is
+        either a regular step in seconds or the sample times of channel 'on'.
+        """
+        start, end = naive_utc(start), naive_utc(end)
+        try:
+            table = await asyncio.to_thread(
+                align_channels, channels.split(','), start, end, step, method,
+                tolerance, on, source, self.db_service, self.data_buffer
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except self.db_service.UNAVAILABLE_ERRORS as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+        return Response(content=json.dumps(table.to_dict()), media_type="application/json")
+
+def check_admin(request: Request):
+    """Reject admin requests without the configured token; with none configured, reject all"""
+    if not Settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints need ADMIN_TOKEN configured")
+    token = request.headers.get('x-admin-token', '')
+    if not hmac.compare_digest(token.encode(), Settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+class ProfilingService:
+    def __init__(self, app: FastAPI):
+        """Register the on-demand profiling endpoint"""
+        self.profiler = Profiler()
+        app.add_api_route("/admin/profile", self.profile, methods=["POST"])
+
+    async def profile(self, request: Request, seconds: float = 10.0,
+                      interval_ms: float = 5.0, top: int = 25):
+        """
+        Profile every thread for a fixed time and download the reports
+
+        Returns a zip with cpu_top.txt (sampled self/total time per function),
+        cpu.collapsed (flame graph input) and alloc_top.txt (tracemalloc top-N).
+        """
+        check_admin(request)
+        if not Settings.PROFILING_ENABLED:
+            raise HTTPException(status_code=404, detail="Profiling is disabled")
+        if not 0 < seconds <= Settings.PROFILE_MAX_SECONDS or interval_ms < 1 or top < 1:
+            raise HTTPException(
+                status_code=422,
+                detail=f"seconds must be in (0, {Settings.PROFILE_MAX_SECONDS}], "
+                       "interval_ms >= 1 and top >= 1"
+            )
+
+        session = self.profiler.begin(interval_ms / 1000.0, top)
+        if session is None:
+            raise HTTPException(status_code=409, detail="A profiling session is already running")
+
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            archive = await asyncio.to_thread(self.profiler.end, session)
+
+        return Response(
+            content=archive,
+            media_type="application/zip",
+            headers={'Content-Disposition': f'attachment; filename="{Profiler.filename()}"'}
+        )
+
+def create_api_app(data_buffer, db_service) -> FastAPI:
+    """
+    Build the collector's read API
+
+    Args:
+        data_buffer: DataBuffer instance whose cache feeds the snapshot endpoint
+        db_service: DatabaseService instance for storage-backed reads
+
+    Returns:
+        FastAPI: The configured application
+    """
+    app = FastAPI()
+    app.state.data_buffer = data_buffer
+    app.state.db_service = db_service
+    app.state.services = [
+        SnapshotService(app, data_buffer.cache),
+        MetricsService(app),
+        ExportService(app, db_service),
+        AnalyticsService(app, data_buffer, db_service),
+        ProfilingService(app)
+    ]
+    return app
@@ -0,0 +1,139 @@
+"""
+Collector running every registry-declared sensor listener on one asyncio loop
+"""
+import asyncio
+import os
+import sys
+import threading
+from config.settings import Settings
+from config.registry import load_registry
+from services.tcp_service import AsyncTCPServer
+from services.udp_service import AsyncUDPServer
+from services.mqtt_service import IMUClient
+from services.http_service import create_app, create_server
+from services.api_service import create_api_app
+from services.ipc_service import IPCReceiver
+from services.overload import OverloadController
+from services.sinks import LocalSink
+from services.storage_writer import StorageWriter
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Collector:
+    def __init__(self, data_buffer, db_service, sensors=None):
+        """
+        Initialize collector from the sensor registry
+
+        Args:
+            data_buffer: DataBuffer instance for storing readings
+            db_service: DatabaseService instance for persistence
+            sensors (list, optional): SensorConfig entries, defaults to load_registry()
+        """
+        self.data_buffer = data_buffer
+        self.db_service = db_service
+        self.sensors = sensors if sensors is not None else load_registry()
+        # Listeners save through the writer so no commit runs on the event loop
+        self.writer = StorageWriter(db_service)
+        self.overload = OverloadController(db_service, self.writer)
+        self.sink = LocalSink(data_buffer, self.writer, self.overload)
+        self.listeners = []
+        self.http_sensors = {}  # (host, port) -> HTTP sensors served there
+
+        for sensor in self.sensors:
+            self.setup_sensor(sensor)
+
+        logger.info(f"Collector initialized with {len(self.sensors)} sensors")
+
+    def buffer_names(self, sensor) -> list:
+        """Buffers a sensor writes to"""
+        if sensor.protocol == 'mqtt':
+            return [f"{sensor.name}_acc", f"{sensor.name}_gyro", f"{sensor.name}_orientation"]
+        return [sensor.name]
+
+    def setup_sensor(self, sensor):
+        """Create the buffers, storage and listener for one sensor"""
+        for name in self.buffer_names(sensor):
+            self.data_buffer.register(name)
+        self.db_service.register_storage(sensor.storage_target, sensor.database_url,
+                                         sensor.channels)
+
+        if sensor.protocol == 'tcp':
+            listener = AsyncTCPServer(sensor, self.data_buffer, self.writer, self.overload)
+        elif sensor.protocol == 'udp':
+            listener = AsyncUDPServer(sensor, self.data_buffer, self.writer, self.overload)
+        elif sensor.protocol == 'http':
+            address = (sensor.host or Settings.HTTP_HOST, sensor.port or Settings.HTTP_PORT)
+            self.http_sensors.setdefault(address, []).append(sensor)
+            return
+        elif sensor.protocol == 'mqtt':
+            listener = IMUClient(
+                self.data_buffer,
+                self.writer,
+                name=sensor.name,
+                topic=sensor.topic,
+                storage=sensor.storage_target,
+                priority=sensor.priority,
+                rollup=sensor.rollup,
+                overload=self.overload
+            )
+        self.listeners.append(listener)
+        self.overload.register(listener, sensor.priority)
+
+    async def serve(self):
+        """Start every listener and run until cancelled"""
+        threading.Thread(target=self.writer.run, name="storage-writer", daemon=True).start()
+        
+        tasks = []
+        for listener in self.listeners:
+            if isinstance(listener, (AsyncTCPServer, AsyncUDPServer)):
+                await listener.start()
+            else:
+                tasks.append(asyncio.create_task(listener.run_async()))
+
+        imu_clients = {listener.name: listener for listener in self.listeners
+                       if isinstance(listener, IMUClient)}
+        if self.http_sensors or imu_clients:
+            # Readings forwarded by HTTP worker processes, samples by extra IMU consumers
+            forwarded = [sensor for sensors in self.http_sensors.values() for sensor in sensors]
+            receiver = IPCReceiver(forwarded, self.sink, imu_clients=imu_clients)
+            await receiver.start()
+            priorities = [sensor.priority for sensor in self.sensors
+                          if sensor in forwarded or sensor.name in imu_clients]
+            high = all(priority == 'high' for priority in priorities)
+            self.overload.register(receiver, 'high' if high else 'normal')
+
+        for (host, port), sensors in self.http_sensors.items():
+            if Settings.HTTP_WORKERS > 1:
+                tasks.append(asyncio.create_task(self.run_http_workers(host, port)))
+            else:
+                server = create_server(create_app(sensors, self.sink, self.overload), host, port)
+                tasks.append(asyncio.create_task(server.serve()))
+
+        tasks.append(asyncio.create_task(self.overload.run()))
+
+        # Read API (snapshots) on its own port
+        api = create_server(create_api_app(self.data_buffer, self.db_service),
+                            Settings.API_HOST, Settings.API_PORT)
+        tasks.append(asyncio.create_task(api.serve()))
+
+        await asyncio.gather(*tasks)
+
+    async def run_http_workers(self, host: str, port: int):
+        """Serve HTTP sensors from a pool of uvicorn worker processes"""
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'uvicorn', 'services.http_service:create_worker_app',
+            '--factory',
+            '--host', host,
+            '--port', str(port),
+            '--workers', str(Settings.HTTP_WORKERS),
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env={**os.environ, 'INGEST_HTTP_PORT': str(port)}
+        )
+        logger.info(f"Started {Settings.HTTP_WORKERS} HTTP workers on {host}:{port}")
+        returncode = await process.wait()
+        logger.error(f"HTTP workers on {host}:{port} exited with code {returncode}")
+
+    def run(self):
+        """Run the collector's event loop in the current thread"""
+        asyncio.run(self.serve())
@@ -0,0 +1,168 @@
+"""
+Compaction job moving old readings into compressed cold-tier blocks
+"""
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from config.settings import Settings
+from utils.gorilla import encode_block
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CompactionService:
+    def __init__(self, db_service, max_age_days: float = None, block_size: int = None):
+        """
+        Initialize compaction for all sensor databases
+
+        Args:
+            db_service: DatabaseService instance owning the engines and models
+            max_age_days (float, optional): Age after which readings are compacted
+            block_size (int, optional): Maximum samples per compressed block
+        """
+        self.db_service = db_service
+        self.max_age = timedelta(days=max_age_days or Settings.COMPACTION_AGE_DAYS)
+        self.block_size = block_size or Settings.COMPACTION_BLOCK_SIZE
+        self.running = True
+
+    def _make_block(self, block_model, channel: str, samples):
+        return block_model(
+            channel=channel,
+            start_time=samples[0][0],
+            end_time=samples[-1][0],
+            count=len(samples),
+            data=encode_block(samples)
+        )
+
+    def _write_blocks(self, session, sensor_type: str, rows) -> int:
+        """Encode rows ordered by channel and time into blocks added to the session"""
+        block_model = self.db_service.block_models[sensor_type]
+        compacted = 0
+        current_channel, samples = None, []
+        for row_channel, timestamp, value in rows:
+            if samples and (row_channel != current_channel or len(samples) >= self.block_size):
+                session.add(self._make_block(block_model, current_channel, samples))
+                compacted += len(samples)
+                samples = []
+            current_channel = row_channel
+            samples.append((timestamp, value))
+        if samples:
+            session.add(self._make_block(block_model, current_channel, samples))
+            compacted += len(samples)
+        return compacted
+
+    def _query_rows(self, session, sensor_type: str, *filters):
+        """(channel, timestamp, value) rows ordered for _write_blocks"""
+        _, model = self.db_service.models[sensor_type]
+        channel = getattr(model, 'value_type', None)
+        columns = [model.timestamp, model.value] + ([channel] if channel is not None else [])
+        order = ([channel] if channel is not None else []) + [model.timestamp, model.id]
+        rows = session.query(*columns).filter(*filters).order_by(*order).yield_per(self.block_size)
+        return ((row[2] if channel is not None else 'value', row[0], row[1]) for row in rows)
+
+    def compact_partition(self, sensor_type: str, name: str, start: datetime,
+                          end: datetime) -> int:
+        """
+        Rewrite one whole partition into compressed blocks and drop it
+
+        The blocks and the DROP commit together, so a failure (including a
+        lock timeout while an export holds the table) leaves the partition
+        untouched for the next run.
+
+        Returns:
+            int: Number of readings compacted
+        """
+        session = self.db_service.sessions[sensor_type]()
+        try:
+            _, model = self.db_service.models[sensor_type]
+            self.db_service.set_lock_timeout(session)
+            # Hold off late writers (e.g. spool replay) until the partition is gone
+            session.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+            compacted = self._write_blocks(session, sensor_type, self._query_rows(
+                session, sensor_type, model.timestamp >= start, model.timestamp < end))
+            session.execute(text(f"DROP TABLE {name}"))
+            session.commit()
+
+            logger.info(f"Compacted {compacted} {sensor_type} readings and dropped partition {name}")
+            return compacted
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error compacting {sensor_type} partition {name}: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def compact_rows(self, sensor_type: str, cutoff: datetime) -> int:
+        """
+        Rewrite readings older than cutoff into blocks and delete them
+
+        Only used for readings tables created before partitioning was
+        introduced, which _connect reports as unpartitioned; partitioned ones
+        are compacted a whole partition at a time.
+
+        Returns:
+            int: Number of readings compacted
+        """
+        session = self.db_service.sessions[sensor_type]()
+        try:
+            _, model = self.db_service.models[sensor_type]
+
+            # Bound the job by id so rows arriving meanwhile are left for the next run
+            max_id = session.query(func.max(model.id)).filter(model.timestamp < cutoff).scalar()
+            if max_id is None:
+                return 0
+
+            filters = (model.timestamp < cutoff, model.id <= max_id)
+            compacted = self._write_blocks(session, sensor_type,
+                                           self._query_rows(session, sensor_type, *filters))
+            session.query(model).filter(*filters).delete(synchronize_session=False)
+            session.commit()
+
+            logger.info(f"Compacted {compacted} {sensor_type} readings older than {cutoff}")
+            return compacted
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error compacting {sensor_type} data: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def compact(self, sensor_type: str) -> int:
+        """
+        Compact readings older than the configured age
+
+        Partitioned tables only give up partitions that end before the cutoff,
+        so a partition straddling it waits for the next run.
+
+        Args:
+            sensor_type (str): Type of sensor ('humidity', 'temperature', 'gas', 'imu')
+
+        Returns:
+            int: Number of readings compacted
+        """
+        cutoff = datetime.utcnow() - self.max_age
+        if not self.db_service.partitioned.get(sensor_type):
+            return self.compact_rows(sensor_type, cutoff)
+
+        compacted = 0
+        try:
+            partitions = self.db_service.load_partitions(sensor_type)
+        except Exception as e:
+            logger.error(f"Error listing {sensor_type} partitions: {e}")
+            return 0
+        for start, end, name in partitions:
+            if end > cutoff:
+                break
+            compacted += self.compact_partition(sensor_type, name, start, end)
+        if compacted:
+            self.db_service.load_partitions(sensor_type)
+        return compacted
+
+    def run(self):
+        """Main compaction loop"""
+        logger.info("Starting compaction service")
+
+        while self.running:
+            for sensor_type in list(self.db_service.sessions.keys()):
+                self.compact(sensor_type)
+            time.sleep(Settings.COMPACTION_INTERVAL)
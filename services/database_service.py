@@ -1,43 +1,165 @@
-from sqlalchemy import create_engine
+import re
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine, exc, select, text
 from sqlalchemy.orm import sessionmaker
 from config.settings import Settings
 from models.database import (
     HumidityBase, TemperatureBase, GasBase, IMUBase,
-    HumidityReading, TemperatureReading, GasReading, IMUReading
+    HumidityReading, TemperatureReading, GasReading, IMUReading,
+    HumidityBlock, TemperatureBlock, GasBlock, IMUBlock,
+    create_reading_models
 )
+from utils.gorilla import decode_block, decode_block_columns, EPOCH
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Partition bound expression as returned by pg_get_expr
+PARTITION_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+class DatabaseUnavailable(Exception):
+    """Raised when a database is not connected and cannot be reconnected yet"""
+
 class DatabaseService:
-    def __init__(self):
+    # Errors meaning "try again later" rather than "this reading is invalid"
+    UNAVAILABLE_ERRORS = (
+        DatabaseUnavailable,
+        exc.OperationalError,
+        exc.InterfaceError,
+        exc.DisconnectionError
+    )
+    # Storage names used before IMU readings went through the 'imu' target
+    LEGACY_TARGETS = {
+        'imu_accelerometer': 'imu',
+        'imu_gyroscope': 'imu',
+    }
+
+    def __init__(self, spool=None):
+        """
+        Connect to every configured database
+        
+        Args:
+            spool (optional): Spool that takes readings while a database is
+                unavailable or slow; without one such readings are dropped
+        """
+        self.spool = spool
+        self.urls = {}
+        self.unavailable_until = {}
+        self.commit_latency = {}  # Smoothed commit seconds per database, for overload control
+        self.last_commit = {}  # time.time() of each database's latest commit
         self.engines = {}
         self.sessions = {}
+        self.partitioned = {}
+        self.partition_bounds = {}
+        self.partition_interval = timedelta(hours=Settings.PARTITION_INTERVAL_HOURS)
         self.models = {
             'humidity': (HumidityBase, HumidityReading),
             'temperature': (TemperatureBase, TemperatureReading),
             'gas': (GasBase, GasReading),
             'imu': (IMUBase, IMUReading)
         }
+        self.block_models = {
+            'humidity': HumidityBlock,
+            'temperature': TemperatureBlock,
+            'gas': GasBlock,
+            'imu': IMUBlock
+        }
         
         # Initialize databases
         for sensor_type, db_config in Settings.DATABASES.items():
+            self._connect(sensor_type, db_config['url'])
+
+    def _connect(self, sensor_type: str, url: str):
+        """Create the engine, session factory, tables and partitions for one database"""
+        self.urls[sensor_type] = url
+        try:
+            engine = create_engine(url, pool_pre_ping=True)
+            SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            
+            # Create tables using appropriate base
+            base, _ = self.models[sensor_type]
+            base.metadata.create_all(bind=engine)
+            self.engines[sensor_type] = engine
+            
+            # Readings live in time partitions that must exist before inserts
+            self.partitioned[sensor_type] = self._is_partitioned(engine)
+            if self.partitioned[sensor_type]:
+                self.ensure_partitions(sensor_type)
+            else:
+                logger.warning(f"{sensor_type} readings table is not partitioned; "
+                               "partition management disabled for it")
+            
+            # Only usable once the schema is in place
+            self.sessions[sensor_type] = SessionLocal
+            self.unavailable_until.pop(sensor_type, None)
+            logger.info(f"Connected to {sensor_type} database")
+        except Exception as e:
+            self.engines.pop(sensor_type, None)
+            self.mark_unavailable(sensor_type)
+            logger.error(f"Error connecting to {sensor_type} database: {e}")
+
+    def mark_unavailable(self, sensor_type: str):
+        """Send this database's writes to the spool until the retry interval passes"""
+        self.unavailable_until[sensor_type] = time.time() + Settings.DB_RETRY_INTERVAL
+
+    def open_session(self, sensor_type: str):
+        """Open a session, reconnecting a database that failed earlier"""
+        if sensor_type not in self.sessions:
+            if time.time() < self.unavailable_until.get(sensor_type, 0):
+                raise DatabaseUnavailable(f"{sensor_type} database is unavailable")
+            self._connect(sensor_type, self.urls[sensor_type])
+            if sensor_type not in self.sessions:
+                raise DatabaseUnavailable(f"{sensor_type} database is unavailable")
+        return self.sessions[sensor_type]()
+
+    def is_available(self, sensor_type: str) -> bool:
+        """
+        Check connectivity, reconnecting if needed
+        
+        A database marked unavailable (down or slow) stays so until the mark
+        expires; only then is it probed and the mark cleared.
+        """
+        if time.time() < self.unavailable_until.get(sensor_type, 0):
+            return False
+        try:
+            session = self.open_session(sensor_type)
             try:
-                engine = create_engine(db_config['url'])
-                SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-                
-                self.engines[sensor_type] = engine
-                self.sessions[sensor_type] = SessionLocal
-                
-                # Create tables using appropriate base
-                base, _ = self.models[sensor_type]
-                base.metadata.create_all(bind=engine)
-                
-                logger.info(f"Connected to {sensor_type} database")
-            except Exception as e:
-                logger.error(f"Error connecting to {sensor_type} database: {e}")
+                session.execute(text("SELECT 1"))
+            finally:
+                session.close()
+            self.unavailable_until.pop(sensor_type, None)
+            return True
+        except Exception as e:
+            self.mark_unavailable(sensor_type)
+            logger.debug(f"{sensor_type} database still unavailable: {e}")
+            return False
 
-    def save_sensor_data(self, sensor_type: str, value: float, value_type: str = None):
+    def register_storage(self, name: str, url: str = None, channels: bool = False):
+        """
+        Make a storage target available, creating its database models if new
+        
+        Args:
+            name (str): Storage target from the sensor registry
+            url (str, optional): Database URL, defaults to Settings.DATABASE_URL_TEMPLATE
+            channels (bool): Whether readings carry a value_type channel
+        """
+        if name in self.models:
+            return
+        
+        base, reading, block = create_reading_models(name, channels)
+        self.models[name] = (base, reading)
+        self.block_models[name] = block
+        self._connect(name, url or Settings.DATABASE_URL_TEMPLATE.format(name=name))
+
+    def has_channels(self, sensor_type: str) -> bool:
+        """Whether readings of this database carry a value_type column"""
+        _, model = self.models[sensor_type]
+        return hasattr(model, 'value_type')
+
+    def save_sensor_data(self, sensor_type: str, value: float, value_type: str = None,
+                         timestamp: datetime = None):
         """
         Save sensor reading to appropriate database
         
@@ -45,40 +167,416 @@ class DatabaseService:
             sensor_type (str): Type of sensor ('humidity', 'temperature', 'gas', 'imu')
             value (float): The sensor reading value
             value_type (str, optional): Type of value for IMU ('acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z')
+            timestamp (datetime, optional): Reading time, defaults to now
         """
-        # Handle IMU sensor types by mapping them to base 'imu' type
-        db_sensor_type = 'imu' if sensor_type.startswith('imu_') else sensor_type
+        return self.save_sensor_batch(sensor_type, [(value_type, value, timestamp)])
+
+    def insert_batch(self, sensor_type: str, readings):
+        """
+        Insert readings in a single commit, raising on failure
         
-        # Get the session maker and model
-        session = self.sessions[db_sensor_type]()
-        try:
-            # Get the model class from the tuple (Base, Model)
-            _, model_class = self.models[db_sensor_type]
-            
-            # Create the appropriate reading object
-            if db_sensor_type == 'imu':
+        Args:
+            sensor_type (str): Database the readings belong to
+            readings: Iterable of (value_type, value, timestamp) tuples
+        """
+        _, model_class = self.models[sensor_type]
+        channels = self.has_channels(sensor_type)
+        
+        rows = []
+        for value_type, value, timestamp in readings:
+            row = {'value': value, 'timestamp': timestamp}
+            if channels:
                 if value_type is None:
                     raise ValueError(f"value_type is required for {sensor_type}")
-                reading = model_class(value_type=value_type, value=value)
-            else:
-                reading = model_class(value=value)
-            
-            session.add(reading)
+                row['value_type'] = value_type
+            rows.append(row)
+        if not rows:
+            return
+        
+        session = self.open_session(sensor_type)
+        try:
+            started = time.time()
+            session.bulk_insert_mappings(model_class, rows)
             session.commit()
+            
+            finished = time.time()
+            elapsed = finished - started
+            # Seeded at 0 so one slow first commit (cold cache, new partition) does not
+            # stand in for the average
+            previous = self.commit_latency.get(sensor_type, 0.0)
+            self.commit_latency[sensor_type] = 0.8 * previous + 0.2 * elapsed
+            self.last_commit[sensor_type] = finished
+            
+            # A database falling behind is treated like an unavailable one
+            if elapsed > Settings.DB_SLOW_COMMIT:
+                logger.warning(f"Slow {sensor_type} commit, spooling for "
+                               f"{Settings.DB_RETRY_INTERVAL}s")
+                self.mark_unavailable(sensor_type)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def storage_target(self, sensor_type: str) -> str:
+        """Database a reading's sensor_type is stored in; unknown names pass through unchanged"""
+        if sensor_type in self.models:
+            return sensor_type
+        return self.LEGACY_TARGETS.get(sensor_type, sensor_type)
+
+    def save_sensor_batch(self, sensor_type: str, readings):
+        """
+        Save many readings to the appropriate database in a single commit
+        
+        Readings go to the spool instead when the database is unavailable or
+        behind; the SpoolReplayer inserts them once it recovers.
+        
+        Args:
+            sensor_type (str): Type of sensor ('humidity', 'temperature', 'gas', 'imu')
+            readings: Iterable of (value_type, value, timestamp) tuples; value_type
+                is ignored for single-value sensors and timestamp may be None
+        """
+        db_sensor_type = self.storage_target(sensor_type)
+        
+        # Timestamps are fixed at ingest so spooled readings keep them on replay
+        now = datetime.utcnow()
+        readings = [(value_type, value, timestamp or now)
+                    for value_type, value, timestamp in readings]
+        
+        try:
+            if (self.spool is not None
+                    and time.time() < self.unavailable_until.get(db_sensor_type, 0)):
+                raise DatabaseUnavailable(f"{db_sensor_type} database is unavailable")
+            self.insert_batch(db_sensor_type, readings)
+            return True
+        except self.UNAVAILABLE_ERRORS as e:
+            self.mark_unavailable(db_sensor_type)
+            if not self.spool_batch(db_sensor_type, readings):
+                logger.error(f"Error saving {sensor_type} data: {e}")
+                return False
             return True
         except Exception as e:
-            session.rollback()
             logger.error(f"Error saving {sensor_type} data: {e}")
             return False
-        finally:
-            session.close()
+
+    def spool_batch(self, sensor_type: str, readings) -> bool:
+        """
+        Append readings to the spool for later replay
+        
+        Args:
+            sensor_type (str): Type of sensor ('humidity', 'temperature', 'gas', 'imu')
+            readings: Iterable of (value_type, value, timestamp) tuples with timestamps set
+        
+        Returns:
+            bool: False when there is no spool to take them
+        """
+        if self.spool is None:
+            return False
+        db_sensor_type = self.storage_target(sensor_type)
+        for value_type, value, timestamp in readings:
+            self.spool.append(db_sensor_type, value_type, value, timestamp)
+        return True
 
     def get_sensor_data(self, sensor_type: str, limit: int = 100):
         # Retrieve sensor readings from appropriate database 
-        session = self.sessions[sensor_type]()
+        session = self.open_session(sensor_type)
         try:
             _, model = self.models[sensor_type]
-            readings = session.query(model).order_by(model.timestamp.desc()).limit(limit).all()
+            if not self.partitioned.get(sensor_type):
+                readings = session.query(model).order_by(model.timestamp.desc()).limit(limit).all()
+            else:
+                # Walk partitions newest first so each query only touches one of them
+                readings = []
+                for start, end in reversed(self.partition_bounds.get(sensor_type, [])):
+                    readings.extend(
+                        session.query(model)
+                        .filter(model.timestamp >= start, model.timestamp < end)
+                        .order_by(model.timestamp.desc())
+                        .limit(limit - len(readings))
+                        .all()
+                    )
+                    if len(readings) >= limit:
+                        break
+            
+            # Older readings may only exist in compacted blocks
+            if len(readings) < limit:
+                before = readings[-1].timestamp if readings else None
+                readings.extend(self._block_readings(session, sensor_type,
+                                                     limit - len(readings), before))
             return readings
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    def _block_readings(self, session, sensor_type: str, limit: int, before: datetime = None):
+        """Newest readings decoded from blocks, as unsaved model instances"""
+        _, model = self.models[sensor_type]
+        block_model = self.block_models[sensor_type]
+        blocks = session.query(block_model).order_by(block_model.end_time.desc())
+        if before is not None:
+            blocks = blocks.filter(block_model.start_time < before)
+        
+        samples = []
+        for block in blocks:
+            # Blocks come newest end first; once limit samples are newer than
+            # this block's end no later block can contribute
+            if len(samples) >= limit and block.end_time < samples[-1][0]:
+                break
+            samples.extend(
+                (timestamp, block.channel, value)
+                for timestamp, value in decode_block(block.data, block.count)
+                if before is None or timestamp < before
+            )
+            samples.sort(key=lambda sample: sample[0], reverse=True)
+            del samples[limit:]
+        
+        has_channel = hasattr(model, 'value_type')
+        return [
+            model(timestamp=timestamp, value=value, value_type=channel) if has_channel
+            else model(timestamp=timestamp, value=value)
+            for timestamp, channel, value in samples
+        ]
+
+    def _is_partitioned(self, engine) -> bool:
+        with engine.connect() as conn:
+            return conn.execute(text(
+                "SELECT 1 FROM pg_partitioned_table pt "
+                "JOIN pg_class c ON c.oid = pt.partrelid "
+                "WHERE c.relname = 'readings' AND pg_table_is_visible(c.oid)"
+            )).first() is not None
+
+    def _partition_start(self, moment: datetime) -> datetime:
+        return EPOCH + ((moment - EPOCH) // self.partition_interval) * self.partition_interval
+
+    def load_partitions(self, sensor_type: str):
+        """Refresh the cached (start, end) ranges; returns (start, end, name) of each partition"""
+        with self.engines[sensor_type].connect() as conn:
+            rows = conn.execute(text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = 'readings' AND pg_table_is_visible(p.oid)"
+            )).fetchall()
+        
+        bounds = []
+        for name, expr in rows:
+            match = PARTITION_BOUND_RE.search(expr or "")
+            if match:
+                bounds.append((datetime.fromisoformat(match.group(1)),
+                               datetime.fromisoformat(match.group(2)),
+                               name))
+        bounds.sort()
+        self.partition_bounds[sensor_type] = [(start, end) for start, end, _ in bounds]
+        return bounds
+
+    def ensure_partitions(self, sensor_type: str, now: datetime = None):
+        """
+        Create the current partition and Settings.PARTITION_PRECREATE future ones
+        
+        Args:
+            sensor_type (str): Type of sensor ('humidity', 'temperature', 'gas', 'imu')
+            now (datetime, optional): Reference time, defaults to current UTC time
+        """
+        if not self.partitioned.get(sensor_type):
+            return
+        
+        current = self._partition_start(now or datetime.utcnow())
+        for i in range(Settings.PARTITION_PRECREATE + 1):
+            start = current + i * self.partition_interval
+            end = start + self.partition_interval
+            name = f"readings_p{start:%Y%m%d%H%M}"
+            try:
+                with self.engines[sensor_type].begin() as conn:
+                    conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF readings "
+                        f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') "
+                        f"TO ('{end.isoformat(sep=' ')}')"
+                    ))
+            except Exception as e:
+                logger.error(f"Error creating {sensor_type} partition {name}: {e}")
+        
+        self.load_partitions(sensor_type)
+
+    def set_lock_timeout(self, executor):
+        """
+        Bound lock waits for the rest of the current transaction
+        
+        DROP TABLE on a partition needs ACCESS EXCLUSIVE on the parent readings
+        table. Without a bound it queues behind a long reader (e.g. a streaming
+        export) and every insert queues behind it; with one it fails after
+        Settings.PARTITION_LOCK_TIMEOUT and the caller retries on its next pass.
+        
+        Args:
+            executor: Session or Connection inside an open transaction
+        """
+        timeout_ms = int(Settings.PARTITION_LOCK_TIMEOUT * 1000)
+        executor.execute(text(f"SET LOCAL lock_timeout = '{timeout_ms}ms'"))
+
+    def drop_expired_partitions(self, sensor_type: str, now: datetime = None) -> int:
+        """
+        Enforce retention by dropping partitions that end before the cutoff
+        
+        Args:
+            sensor_type (str): Type of sensor ('humidity', 'temperature', 'gas', 'imu')
+            now (datetime, optional): Reference time, defaults to current UTC time
+            
+        Returns:
+            int: Number of partitions dropped
+        """
+        retention_days = Settings.RETENTION_DAYS.get(sensor_type)
+        if retention_days is None or not self.partitioned.get(sensor_type):
+            return 0
+        
+        cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        dropped = 0
+        for start, end, name in self.load_partitions(sensor_type):
+            if end > cutoff:
+                break
+            try:
+                with self.engines[sensor_type].begin() as conn:
+                    self.set_lock_timeout(conn)
+                    conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped += 1
+                logger.info(f"Dropped expired {sensor_type} partition {name}")
+            except Exception as e:
+                # Typically a lock timeout behind a reader; retried on the next run
+                logger.error(f"Error dropping {sensor_type} partition {name}: {e}")
+        
+        # Compressed blocks follow the same retention
+        session = self.sessions[sensor_type]()
+        try:
+            block_model = self.block_models[sensor_type]
+            session.query(block_model).filter(block_model.end_time < cutoff).delete(
+                synchronize_session=False)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error expiring {sensor_type} blocks: {e}")
+        finally:
+            session.close()
+        
+        if dropped:
+            self.load_partitions(sensor_type)
+        return dropped
+
+    def run_partition_maintenance(self):
+        """Pre-create upcoming partitions and drop expired ones periodically"""
+        logger.info("Starting partition maintenance")
+        
+        while True:
+            for sensor_type in list(self.sessions.keys()):
+                try:
+                    self.ensure_partitions(sensor_type)
+                    self.drop_expired_partitions(sensor_type)
+                except Exception as e:
+                    logger.error(f"Error maintaining {sensor_type} partitions: {e}")
+            time.sleep(Settings.PARTITION_MAINTENANCE_INTERVAL)
+
+    def get_sensor_range(self, sensor_type: str, start, end, value_type: str = None):
+        """
+        Retrieve readings in a time range, decoding compressed blocks as needed
+
+        Args:
+            sensor_type (str): Type of sensor ('humidity', 'temperature', 'gas', 'imu')
+            start (datetime): Inclusive range start
+            end (datetime): Exclusive range end
+            value_type (str, optional): Restrict IMU readings to one channel
+
+        Returns:
+            list: (timestamp, channel, value) tuples ordered by timestamp
+        """
+        session = self.open_session(sensor_type)
+        try:
+            _, model = self.models[sensor_type]
+            block_model = self.block_models[sensor_type]
+            results = []
+
+            # Cold tier: decode every block overlapping the range
+            blocks = session.query(block_model).filter(
+                block_model.end_time >= start,
+                block_model.start_time < end
+            )
+            if value_type is not None:
+                blocks = blocks.filter(block_model.channel == value_type)
+            for block in blocks:
+                for timestamp, value in decode_block(block.data, block.count):
+                    if start <= timestamp < end:
+                        results.append((timestamp, block.channel, value))
+
+            # Hot tier: raw rows
+            channel = getattr(model, 'value_type', None)
+            columns = [model.timestamp, model.value] + ([channel] if channel is not None else [])
+            rows = session.query(*columns).filter(
+                model.timestamp >= start,
+                model.timestamp < end
+            )
+            if value_type is not None and channel is not None:
+                rows = rows.filter(channel == value_type)
+            for row in rows:
+                results.append((row[0], row[2] if channel is not None else 'value', row[1]))
+
+            results.sort(key=lambda reading: reading[0])
+            return results
+        finally:
+            session.close()
+
+    def get_sensor_series(self, sensor_type: str, start, end, value_type: str = None):
+        """
+        Retrieve one channel in a time range as numpy arrays
+
+        Unlike get_sensor_range no per-row tuples are kept: hot rows are fetched
+        through a server-side cursor and converted chunk by chunk, blocks are
+        decoded straight into columns.
+
+        Args:
+            sensor_type (str): Type of sensor ('humidity', 'temperature', 'gas', 'imu')
+            start (datetime): Inclusive range start
+            end (datetime): Exclusive range end
+            value_type (str, optional): Channel of a multi-axis sensor
+
+        Returns:
+            tuple: (datetime64[us] timestamps, float64 values) ordered by timestamp
+        """
+        session = self.open_session(sensor_type)
+        try:
+            _, model = self.models[sensor_type]
+            block_model = self.block_models[sensor_type]
+            channel = getattr(model, 'value_type', None)
+            times, values = [], []
+
+            # Cold tier
+            blocks = session.query(block_model.count, block_model.data).filter(
+                block_model.end_time >= start,
+                block_model.start_time < end
+            )
+            if value_type is not None:
+                blocks = blocks.filter(block_model.channel == value_type)
+            for count, data in blocks:
+                micros, block_values = decode_block_columns(data, count)
+                times.append(np.array(micros, dtype='datetime64[us]'))
+                values.append(np.array(block_values, dtype=np.float64))
+
+            # Hot tier
+            query = (
+                select(model.timestamp, model.value)
+                .where(model.timestamp >= start, model.timestamp < end)
+                .execution_options(stream_results=True, yield_per=Settings.EXPORT_CHUNK_SIZE)
+            )
+            if value_type is not None and channel is not None:
+                query = query.where(channel == value_type)
+            for rows in session.execute(query).partitions():
+                chunk_times, chunk_values = zip(*rows)
+                times.append(np.array(chunk_times, dtype='datetime64[us]'))
+                values.append(np.array(chunk_values, dtype=np.float64))
+        finally:
+            session.close()
+
+        if not times:
+            return np.empty(0, dtype='datetime64[us]'), np.empty(0, dtype=np.float64)
+        times = np.concatenate(times)
+        values = np.concatenate(values)
+
+        # Blocks can extend past either end of the range
+        mask = (times >= np.datetime64(start, 'us')) & (times < np.datetime64(end, 'us'))
+        order = np.argsort(times[mask], kind='stable')
+        return times[mask][order], values[mask][order]
\ No newline at end of file
@@ -0,0 +1,347 @@
+"""
+Streaming bulk export of readings to CSV, Parquet or NPY
+
+Rows are read through server-side cursors and compressed blocks are decoded
+one at a time, so memory stays bounded by the chunk size whatever the range.
+"""
+import argparse
+import csv
+import heapq
+import io
+import itertools
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import select
+from config.settings import Settings
+from utils.gorilla import decode_block
+import logging
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'parquet', 'npy')
+
+# Column order for pivoted multi-axis sensors; unknown channels follow sorted
+CHANNEL_ORDER = ['acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z', 'roll', 'pitch', 'yaw']
+
+def naive_utc(moment: datetime) -> datetime:
+    """Convert an aware datetime (e.g. parsed from '...Z') to the naive UTC stored in the databases"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def parse_time(text: str) -> datetime:
+    return naive_utc(datetime.fromisoformat(text))
+
+def order_channels(channels) -> list:
+    known = [name for name in CHANNEL_ORDER if name in channels]
+    return known + sorted(set(channels) - set(known))
+
+class ReadingStream:
+    def __init__(self, db_service, sensor_type: str, start: datetime, end: datetime,
+                 value_type: str = None, chunk_size: int = None):
+        """
+        Time-ordered readings of one database, cold and hot tiers merged
+
+        Args:
+            db_service: DatabaseService owning the sessions and models
+            sensor_type (str): Database to export
+            start (datetime): Inclusive range start
+            end (datetime): Exclusive range end
+            value_type (str, optional): Restrict multi-axis sensors to one channel
+            chunk_size (int, optional): Rows fetched per round trip
+        """
+        self.db_service = db_service
+        self.sensor_type = sensor_type
+        self.start = start
+        self.end = end
+        self.value_type = value_type
+        self.chunk_size = chunk_size or Settings.EXPORT_CHUNK_SIZE
+        _, self.model = db_service.models[sensor_type]
+        self.block_model = db_service.block_models[sensor_type]
+        self.channel_column = getattr(self.model, 'value_type', None)
+
+    def channels(self, session) -> list:
+        """Channels present in the range, in export column order"""
+        if self.channel_column is None:
+            return ['value']
+        if self.value_type is not None:
+            return [self.value_type]
+
+        model, block_model = self.model, self.block_model
+        hot = session.execute(
+            select(model.value_type).distinct()
+            .where(model.timestamp >= self.start, model.timestamp < self.end)
+        ).scalars().all()
+        cold = session.execute(
+            select(block_model.channel).distinct()
+            .where(block_model.end_time >= self.start, block_model.start_time < self.end)
+        ).scalars().all()
+        return order_channels({name for name in hot + cold if name is not None})
+
+    def _block_readings(self, session, block_ids, channel: str):
+        """Decode a channel's blocks one at a time"""
+        for block_id in block_ids:
+            block = session.get(self.block_model, block_id)
+            for timestamp, value in decode_block(block.data, block.count):
+                if self.start <= timestamp < self.end:
+                    yield timestamp, channel, value
+            session.expunge(block)
+
+    def _cold(self, session):
+        block_model = self.block_model
+        query = (
+            select(block_model.id, block_model.channel)
+            .where(block_model.end_time >= self.start, block_model.start_time < self.end)
+            .order_by(block_model.channel, block_model.start_time)
+        )
+        if self.value_type is not None:
+            query = query.where(block_model.channel == self.value_type)
+
+        # Block metadata is tiny (one row per block); payloads are loaded lazily
+        per_channel = {}
+        for block_id, channel in session.execute(query):
+            per_channel.setdefault(channel, []).append(block_id)
+        return heapq.merge(
+            *(self._block_readings(session, ids, channel) for channel, ids in per_channel.items()),
+            key=lambda reading: reading[0]
+        )
+
+    def _hot(self, session):
+        model = self.model
+        columns = [model.timestamp, model.value]
+        if self.channel_column is not None:
+            columns.append(self.channel_column)
+        query = (
+            select(*columns)
+            .where(model.timestamp >= self.start, model.timestamp < self.end)
+            .order_by(model.timestamp, model.id)
+            .execution_options(stream_results=True, yield_per=self.chunk_size)
+        )
+        if self.value_type is not None and self.channel_column is not None:
+            query = query.where(self.channel_column == self.value_type)
+
+        # Server-side cursor: rows arrive chunk_size at a time
+        for rows in session.execute(query).partitions():
+            for row in rows:
+                yield row[0], row[2] if self.channel_column is not None else 'value', row[1]
+
+    def readings(self, session):
+        """Iterate (timestamp, channel, value) over both tiers in time order"""
+        return heapq.merge(self._cold(session), self._hot(session),
+                           key=lambda reading: reading[0])
+
+    def rows(self, session, channels: list):
+        """
+        Iterate chunks of pivoted rows
+
+        Channels are pivoted into columns: consecutive readings are merged into
+        one row until a channel repeats or they drift apart by more than
+        Settings.EXPORT_PIVOT_TOLERANCE seconds.
+
+        Yields:
+            tuple: (timestamps list, {channel: values list})
+        """
+        index = {name: i for i, name in enumerate(channels)}
+        tolerance = Settings.EXPORT_PIVOT_TOLERANCE
+        timestamps, values = [], []
+        row_time, row = None, None
+
+        for timestamp, channel, value in self.readings(session):
+            slot = index.get(channel)
+            if slot is None:
+                continue
+            if (row is None or row[slot] is not None
+                    or (timestamp - row_time).total_seconds() > tolerance):
+                if row is not None:
+                    timestamps.append(row_time)
+                    values.append(row)
+                    if len(timestamps) >= self.chunk_size:
+                        yield self._columns(timestamps, values, channels)
+                        timestamps, values = [], []
+                row_time, row = timestamp, [None] * len(channels)
+            row[slot] = value
+
+        if row is not None:
+            timestamps.append(row_time)
+            values.append(row)
+        if timestamps:
+            yield self._columns(timestamps, values, channels)
+
+    @staticmethod
+    def _columns(timestamps, values, channels):
+        return timestamps, {name: [row[i] for row in values] for i, name in enumerate(channels)}
+
+class CSVExportWriter:
+    def __init__(self, output, channels: list):
+        self.output = output
+        self.writer = csv.writer(output)
+        self.writer.writerow(['timestamp'] + channels)
+        self.channels = channels
+
+    def write_chunk(self, timestamps, columns):
+        self.writer.writerows(zip(
+            (timestamp.isoformat() for timestamp in timestamps),
+            *(columns[name] for name in self.channels)
+        ))
+
+    def close(self):
+        self.output.flush()
+
+class ParquetExportWriter:
+    def __init__(self, output, channels: list):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.channels = channels
+        self.schema = pa.schema([('timestamp', pa.timestamp('us'))]
+                                + [(name, pa.float64()) for name in channels])
+        self.writer = pq.ParquetWriter(output, self.schema)
+
+    def write_chunk(self, timestamps, columns):
+        arrays = [self.pa.array(timestamps, type=self.pa.timestamp('us'))]
+        arrays += [self.pa.array(columns[name], type=self.pa.float64()) for name in self.channels]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+class NPYExportWriter:
+    # Header is sized for the largest possible row count and rewritten at close
+    MAX_ROWS = 10 ** 19
+
+    def __init__(self, output, channels: list):
+        """Writes a 1-D structured array; output must be seekable"""
+        self.output = output
+        self.channels = channels
+        self.dtype = np.dtype([('timestamp', 'datetime64[us]')]
+                              + [(name, 'f8') for name in channels])
+        self.count = 0
+        self.header_size = len(self._header(self.MAX_ROWS))
+        self.output.write(self._header(0, self.header_size))
+
+    def _header(self, count: int, size: int = None) -> bytes:
+        descr = np.lib.format.dtype_to_descr(self.dtype)
+        header = f"{{'descr': {descr!r}, 'fortran_order': False, 'shape': ({count},), }}"
+        # magic (6) + version (2) + header length (2) + header, padded to 64 bytes
+        if size is None:
+            size = -(-(10 + len(header) + 1) // 64) * 64
+        header = header.ljust(size - 10 - 1) + "\n"
+        return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+    def write_chunk(self, timestamps, columns):
+        array = np.empty(len(timestamps), dtype=self.dtype)
+        array['timestamp'] = np.array(timestamps, dtype='datetime64[us]')
+        for name in self.channels:
+            array[name] = np.array([np.nan if value is None else value for value in columns[name]],
+                                   dtype='f8')
+        self.output.write(array.tobytes())
+        self.count += len(array)
+
+    def close(self):
+        self.output.seek(0)
+        self.output.write(self._header(self.count, self.header_size))
+        self.output.flush()
+
+WRITERS = {
+    'csv': CSVExportWriter,
+    'parquet': ParquetExportWriter,
+    'npy': NPYExportWriter
+}
+
+def export_readings(db_service, sensor_type: str, start: datetime, end: datetime,
+                    fmt: str, output, value_type: str = None) -> int:
+    """
+    Stream a sensor's readings for a time range into a file
+
+    Args:
+        db_service: DatabaseService owning the sessions and models
+        sensor_type (str): Database to export
+        start (datetime): Inclusive range start
+        end (datetime): Exclusive range end
+        fmt (str): 'csv', 'parquet' or 'npy'
+        output: Writable file object (text for csv, binary otherwise)
+        value_type (str, optional): Restrict multi-axis sensors to one channel
+
+    Returns:
+        int: Number of rows written
+    """
+    stream = ReadingStream(db_service, sensor_type, start, end, value_type)
+    session = db_service.open_session(sensor_type)
+    try:
+        channels = stream.channels(session)
+        writer = WRITERS[fmt](output, channels)
+        count = 0
+        for timestamps, columns in stream.rows(session, channels):
+            writer.write_chunk(timestamps, columns)
+            count += len(timestamps)
+        writer.close()
+        logger.info(f"Exported {count} {sensor_type} rows as {fmt}")
+        return count
+    finally:
+        session.close()
+
+def open_csv(db_service, sensor_type: str, start: datetime, end: datetime,
+             value_type: str = None):
+    """
+    Start a CSV export for a streaming HTTP response
+
+    The session is opened and the first chunk fetched before returning, so an
+    unreachable database raises here, while the endpoint can still answer with
+    an error status, instead of truncating a response that already sent 200.
+
+    Returns:
+        iterator: CSV text chunk by chunk
+    """
+    stream = ReadingStream(db_service, sensor_type, start, end, value_type)
+    session = db_service.open_session(sensor_type)
+    try:
+        channels = stream.channels(session)
+        rows = stream.rows(session, channels)
+        first = next(rows, None)
+    except Exception:
+        session.close()
+        raise
+    return _csv_chunks(session, channels, itertools.chain([first] if first else [], rows))
+
+def _csv_chunks(session, channels: list, rows):
+    try:
+        buffer = io.StringIO()
+        writer = CSVExportWriter(buffer, channels)
+        for timestamps, columns in rows:
+            writer.write_chunk(timestamps, columns)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # Header only, for an empty range
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        session.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Export sensor readings")
+    parser.add_argument("sensor_type", help="Database to export, e.g. temperature or imu")
+    parser.add_argument("--start", required=True, type=parse_time,
+                        help="Inclusive start, ISO format (UTC unless an offset is given)")
+    parser.add_argument("--end", required=True, type=parse_time,
+                        help="Exclusive end, ISO format (UTC unless an offset is given)")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--value-type", help="Single channel of a multi-axis sensor")
+    parser.add_argument("--output", required=True, help="Output file")
+    args = parser.parse_args()
+
+    from services.database_service import DatabaseService
+    db_service = DatabaseService()
+
+    mode = {'newline': '', 'mode': 'w'} if args.format == 'csv' else {'mode': 'wb'}
+    with open(args.output, **mode) as output:
+        count = export_readings(db_service, args.sensor_type, args.start, args.end,
+                                args.format, output, args.value_type)
+    print(f"Wrote {count} rows to {args.output}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,82 +1,163 @@
 """
-FastAPI server implementation for humidity sensor
+FastAPI ingestion app for HTTP sensors
 """
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import os
+import threading
+from fastapi import FastAPI, HTTPException, Request
 import uvicorn
 import logging
 from config.settings import Settings
+from config.registry import SensorConfig, load_registry
+from services.sinks import IPCSink, LocalSink, SinkOverloaded, SinkUnavailable, StorageSink
+from utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
-# Initialize FastAPI app
-app = FastAPI()
+# Registry entry used when the HTTP service is started without a registry
+HUMIDITY_SENSOR = SensorConfig(
+    name='humidity',
+    protocol='http',
+    path='/humidity',
+    field='humidity',
+    decoder='json',
+    storage='humidity'
+)
 
-# Pydantic model for humidity data
-class HumidityData(BaseModel):
-    humidity: float
-
-class HumidityService:
-    def __init__(self, data_buffer, db_service):
+class SensorHTTPService:
+    def __init__(self, app: FastAPI, sensor, sink, overload=None):
         """
-        Initialize humidity service
-        
+        Register the POST route of a registry-declared HTTP sensor
+
         Args:
-            data_buffer: DataBuffer instance for storing readings
-            db_service: DatabaseService instance for persistence
+            app: FastAPI application to register the route on
+            sensor: SensorConfig with path, field and storage target
+            sink: Sink readings are handed to (LocalSink, IPCSink or StorageSink)
+            overload (optional): OverloadController of an in-process collector
         """
-        self.data_buffer = data_buffer
-        self.db_service = db_service
-        self.setup_routes()
-        
-        logger.info("Humidity HTTP service initialized")
-
-    def setup_routes(self):
-        """Set up FastAPI routes"""
-        
-        @app.post("/humidity")
-        async def receive_humidity(humidity_data: HumidityData):
-            try:
-                # Store in buffer
-                self.data_buffer.add_data('humidity', humidity_data.humidity)
-                
-                # Save to database
-                self.db_service.save_sensor_data(
-                    sensor_type='humidity',
-                    value_type='value',
-                    value=humidity_data.humidity
-                )
-                
-                logger.debug(f"Received humidity: {humidity_data.humidity}%")
-                
-                return {
-                    "status": "success",
-                    "message": f"Humidity received: {humidity_data.humidity}%"
-                }
-                
-            except Exception as e:
-                logger.error(f"Error processing humidity data: {e}")
-                raise HTTPException(
-                    status_code=500,
-                    detail="Error processing humidity data"
-                )
+        self.sensor = sensor
+        self.sink = sink
+        self.overload = overload
 
-def start_fastapi(data_buffer, db_service):
+        app.add_api_route(sensor.path, self.receive, methods=["POST"])
+        logger.info(f"{sensor.name} HTTP route registered at {sensor.path}")
+
+    def too_many_requests(self):
+        metrics.inc(f'overload.rejected.{self.sensor.name}')
+        return HTTPException(
+            status_code=429,
+            detail=f"{self.sensor.name} ingestion is overloaded, retry later",
+            headers={'Retry-After': str(Settings.OVERLOAD_RETRY_AFTER)}
+        )
+
+    async def receive(self, request: Request):
+        if self.overload is not None and self.overload.rejecting(self.sensor.priority):
+            raise self.too_many_requests()
+
+        try:
+            payload = await request.json()
+            value = float(payload[self.sensor.field])
+        except Exception:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Expected JSON object with numeric '{self.sensor.field}'"
+            )
+
+        try:
+            self.sink.submit(self.sensor, value)
+
+            logger.debug(f"Received {self.sensor.name}: {value}")
+
+            return {
+                "status": "success",
+                "message": f"{self.sensor.name} received: {value}"
+            }
+
+        except SinkOverloaded as e:
+            logger.debug(f"Throttling {self.sensor.name} reading: {e}")
+            raise self.too_many_requests()
+        except SinkUnavailable as e:
+            logger.warning(f"Rejecting {self.sensor.name} reading: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail=f"{self.sensor.name} ingestion temporarily unavailable"
+            )
+        except Exception as e:
+            logger.error(f"Error processing {self.sensor.name} data: {e}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error processing {self.sensor.name} data"
+            )
+
+def create_app(sensors, sink, overload=None) -> FastAPI:
     """
-    Start the FastAPI server
-    
+    Build an ingestion app; all state is injected, nothing is module-global
+
     Args:
-        data_buffer: DataBuffer instance for storing readings
-        db_service: DatabaseService instance for persistence
+        sensors (list): HTTP SensorConfig entries to register routes for
+        sink: Sink readings are handed to
+        overload (optional): OverloadController answering 429 under backpressure
+
+    Returns:
+        FastAPI: The configured application
+    """
+    app = FastAPI()
+    app.state.sink = sink
+    app.state.services = [SensorHTTPService(app, sensor, sink, overload) for sensor in sensors]
+    return app
+
+def create_worker_app() -> FastAPI:
     """
-    humidity_service = HumidityService(data_buffer, db_service)
-    
+    App factory for multi-process serving, e.g.
+
+        uvicorn services.http_service:create_worker_app --factory --workers 4
+
+    Each worker forwards readings to the collector over Settings.INGEST_SOCKET,
+    or writes straight to storage when Settings.HTTP_WORKER_SINK is 'storage'.
+    INGEST_HTTP_PORT restricts the routes to sensors declared on that port.
+    """
+    port = os.environ.get('INGEST_HTTP_PORT')
+    sensors = [
+        sensor for sensor in load_registry()
+        if sensor.protocol == 'http'
+        and (port is None or (sensor.port or Settings.HTTP_PORT) == int(port))
+    ]
+
+    if Settings.HTTP_WORKER_SINK == 'storage':
+        from services.database_service import DatabaseService
+        from services.storage_writer import StorageWriter
+        db_service = DatabaseService()
+        for sensor in sensors:
+            db_service.register_storage(sensor.storage_target, sensor.database_url,
+                                        sensor.channels)
+        # Commits run on the writer thread, not the worker's event loop
+        writer = StorageWriter(db_service)
+        threading.Thread(target=writer.run, daemon=True).start()
+        sink = StorageSink(writer)
+    else:
+        sink = IPCSink()
+
+    logger.info(f"HTTP worker {os.getpid()} serving {len(sensors)} sensors")
+    return create_app(sensors, sink)
+
+def create_server(app: FastAPI, host: str, port: int) -> uvicorn.Server:
+    """Build a uvicorn server that can be awaited on an existing event loop"""
     config = uvicorn.Config(
         app,
-        host=Settings.HTTP_HOST,
-        port=Settings.HTTP_PORT,
+        host=host,
+        port=port,
         log_level="info"
     )
-    
-    server = uvicorn.Server(config)
-    server.run()
\ No newline at end of file
+    return uvicorn.Server(config)
+
+def start_fastapi(data_buffer, db_service):
+    """
+    Start the FastAPI server
+
+    Args:
+        data_buffer: DataBuffer instance for storing readings
+        db_service: DatabaseService instance for persistence
+    """
+    app = create_app([HUMIDITY_SENSOR], LocalSink(data_buffer, db_service))
+
+    server = create_server(app, Settings.HTTP_HOST, Settings.HTTP_PORT)
+    server.run()
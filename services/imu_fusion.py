@@ -0,0 +1,101 @@
+"""
+Vectorized IMU orientation estimation using a complementary filter
+"""
+import numpy as np
+from config.settings import Settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keep alpha ** -n within this bound when solving the filter recursion in chunks
+MAX_CHUNK_GAIN = 1e6
+
+class OrientationFilter:
+    def __init__(self, alpha: float = None):
+        """
+        Initialize complementary filter with per-device state
+
+        Roll and pitch blend integrated gyroscope rates (deg/s) with the tilt
+        implied by the accelerometer (g); yaw has no absolute reference and is
+        integrated from the gyroscope only.
+
+        Args:
+            alpha (float, optional): Gyroscope weight in (0, 1)
+        """
+        self.alpha = Settings.IMU_FILTER_ALPHA if alpha is None else alpha
+        if not 0.0 < self.alpha < 1.0:
+            raise ValueError("alpha must be between 0 and 1")
+
+        # device -> (roll, pitch, yaw, last timestamp)
+        self.states = {}
+        self.chunk_size = max(1, int(np.log(MAX_CHUNK_GAIN) / -np.log(self.alpha)))
+
+    def _filter(self, initial: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+        """
+        Solve theta[k] = alpha * theta[k-1] + inputs[k] for all k at once
+
+        Args:
+            initial (np.ndarray): Angles before the first sample, shape (C,)
+            inputs (np.ndarray): Per-sample input terms, shape (N, C)
+        """
+        output = np.empty_like(inputs)
+        previous = initial
+        for start in range(0, len(inputs), self.chunk_size):
+            chunk = inputs[start:start + self.chunk_size]
+            powers = self.alpha ** np.arange(1, len(chunk) + 1)[:, None]
+            # theta[k] = alpha^(k+1) * (theta[-1] + sum_{j<=k} alpha^-(j+1) * u[j])
+            result = powers * (previous + np.cumsum(chunk / powers, axis=0))
+            output[start:start + len(chunk)] = result
+            previous = result[-1]
+        return output
+
+    def process(self, device: str, timestamps, acc, gyro) -> np.ndarray:
+        """
+        Estimate orientation for a batch of samples from one device
+
+        Args:
+            device (str): Device identifier, used to carry filter state across batches
+            timestamps: Sample times in seconds, shape (N,)
+            acc: Accelerometer samples in g, shape (N, 3)
+            gyro: Gyroscope samples in deg/s, shape (N, 3)
+
+        Returns:
+            np.ndarray: Roll, pitch and yaw in degrees, shape (N, 3)
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        acc = np.asarray(acc, dtype=np.float64).reshape(-1, 3)
+        gyro = np.asarray(gyro, dtype=np.float64).reshape(-1, 3)
+        if len(timestamps) == 0:
+            return np.empty((0, 3))
+
+        # Tilt from gravity direction
+        acc_roll = np.degrees(np.arctan2(acc[:, 1], acc[:, 2]))
+        acc_pitch = np.degrees(np.arctan2(-acc[:, 0], np.hypot(acc[:, 1], acc[:, 2])))
+
+        state = self.states.get(device)
+        if state is None:
+            # Seed from the first sample so the filter does not start at zero
+            state = (acc_roll[0], acc_pitch[0], 0.0, timestamps[0])
+        roll, pitch, yaw, last_time = state
+
+        dt = np.diff(timestamps, prepend=last_time)
+        dt = np.clip(dt, 0.0, None)
+        rates = gyro * dt[:, None]
+
+        inputs = self.alpha * rates[:, :2] + (1.0 - self.alpha) * np.column_stack(
+            (acc_roll, acc_pitch))
+        tilt = self._filter(np.array([roll, pitch]), inputs)
+        heading = yaw + np.cumsum(rates[:, 2])
+        heading = (heading + 180.0) % 360.0 - 180.0
+
+        orientation = np.column_stack((tilt, heading))
+        self.states[device] = (orientation[-1, 0], orientation[-1, 1],
+                               orientation[-1, 2], timestamps[-1])
+        return orientation
+
+    def reset(self, device: str = None):
+        """Forget filter state for one device, or all devices"""
+        if device is None:
+            self.states.clear()
+        else:
+            self.states.pop(device, None)
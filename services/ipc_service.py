@@ -0,0 +1,112 @@
+"""
+Collector-side receiver for readings forwarded by HTTP worker processes and
+for IMU samples forwarded by the other MQTT consumers of the share group
+"""
+import asyncio
+import json
+import os
+import socket
+from config.settings import Settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+class IPCReceiver:
+    def __init__(self, sensors, sink, path: str = None, imu_clients=None):
+        """
+        Initialize receiver for the ingest Unix socket
+
+        Args:
+            sensors (list): SensorConfig entries that may be forwarded
+            sink: Sink readings are handed to (normally a LocalSink)
+            path (str, optional): Socket path, defaults to Settings.INGEST_SOCKET
+            imu_clients (dict, optional): Sensor name -> IMUClient receiving
+                forwarded IMU samples
+        """
+        self.sensors = {sensor.name: sensor for sensor in sensors}
+        self.sink = sink
+        self.imu_clients = imu_clients or {}
+        self.path = path or Settings.INGEST_SOCKET
+        self.sock = None
+        self.loop = None
+        self.received = 0
+        self.rejected = 0
+
+    def drain(self):
+        """
+        Read every queued message (up to Settings.IPC_BATCH) and hand them to
+        the sink as one batch per sensor
+        """
+        pending = {}  # sensor name -> values
+        for _ in range(Settings.IPC_BATCH):
+            try:
+                data = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                logger.error(f"IPC socket error: {e}")
+                break
+            self.process_message(data, pending)
+
+        for name, values in pending.items():
+            try:
+                self.sink.submit_many(self.sensors[name], values)
+            except Exception as e:
+                logger.error(f"Error storing forwarded {name} readings: {e}")
+
+    def process_message(self, data: bytes, pending: dict):
+        try:
+            message = json.loads(data)
+            if 'samples' in message:
+                samples = [(float(timestamp), acc, gyro)
+                           for timestamp, acc, gyro in message['samples']]
+                self.imu_clients[message['sensor']].receive_samples(message['device'], samples)
+                self.received += len(samples)
+                return
+            sensor = self.sensors[message['sensor']]
+            pending.setdefault(sensor.name, []).append(float(message['value']))
+            self.received += 1
+        except Exception as e:
+            self.rejected += 1
+            logger.error(f"Error processing forwarded reading: {e}")
+
+    def pause(self):
+        """Stop reading under backpressure; workers then answer 429 once the queue fills"""
+        if self.loop is not None:
+            self.loop.remove_reader(self.sock)
+
+    def resume(self):
+        if self.loop is not None:
+            self.loop.add_reader(self.sock, self.drain)
+
+    def in_use(self) -> bool:
+        """Whether a live process is bound to the socket path"""
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            probe.connect(self.path)
+            return True
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        finally:
+            probe.close()
+
+    async def start(self):
+        """Bind the socket and drain it from the running event loop"""
+        if os.path.exists(self.path):
+            if self.in_use():
+                raise RuntimeError(f"Another collector is already listening on {self.path}")
+            os.unlink(self.path)  # stale socket from a previous run
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, Settings.IPC_RECV_BUFFER)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.sock, self.drain)
+        logger.info(f"Listening for forwarded readings on {self.path}")
+
+    def close(self):
+        if self.loop is not None:
+            self.loop.remove_reader(self.sock)
+        self.sock.close()
@@ -1,29 +1,82 @@
 """
 MQTT client implementation for IMU sensor
 """
+import argparse
+import asyncio
+import multiprocessing
+import os
+import threading
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 import json
 import time
+from datetime import datetime, timedelta
 from config.settings import Settings
+from services.imu_fusion import OrientationFilter
+from services.overload import SensorGate
+from services.sinks import IPCSink, SinkUnavailable
+from utils.metrics import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+def consumer_client_id(name: str, index: int = 0, group: str = None) -> str:
+    """
+    Stable client id of one IMU consumer
+    
+    The same node, group and index always reconnect under the same id, so the
+    broker resumes the persistent session instead of starting a new one.
+    """
+    parts = [group, Settings.MQTT_CONSUMER_ID, name, str(index)]
+    return "-".join(part for part in parts if part)
+
 class IMUClient:
-    def __init__(self, data_buffer, db_service):
+    def __init__(self, data_buffer, db_service, name: str = 'imu',
+                 topic: str = None, storage: str = 'imu', priority: str = 'normal',
+                 rollup: bool = False, overload=None, index: int = 0, group: str = None,
+                 forward=None):
         """
         Initialize MQTT client for IMU sensor
         
         Args:
             data_buffer: DataBuffer instance for storing readings
-            db_service: DatabaseService instance for persistence
+            db_service: StorageWriter (or DatabaseService) the readings are saved through
+            name (str): Sensor name, prefix of the '_acc', '_gyro' and '_orientation' buffers
+            topic (str, optional): Topic filter, defaults to Settings.MQTT_TOPIC
+            storage (str): Database the readings are saved to
+            priority (str): Overload priority ('low', 'normal' or 'high')
+            rollup (bool): Store window means instead of readings in rollup mode
+            overload (optional): OverloadController deciding what is shed
+            index (int): Consumer number on this node, part of the client id
+            group (str, optional): Shared subscription group, defaults to
+                Settings.MQTT_SHARE_GROUP
+            forward (optional): IPCSink to the collector; when given, samples are
+                stored here and sent to the collector one fusion batch per
+                datagram, and the collector, which sees the samples of every
+                consumer in the group, buffers and fuses them
         """
         self.data_buffer = data_buffer
         self.db_service = db_service
+        self.name = name
+        self.topic = topic or Settings.MQTT_TOPIC
+        self.storage = storage
+        self.group = group or Settings.MQTT_SHARE_GROUP
+        # Consumers of one group split the messages between them
+        self.subscription = f"$share/{self.group}/{self.topic}" if self.group else self.topic
+        self.gate = SensorGate(name, priority, rollup, overload)
+        self.forward = forward
+        self.loop = None
+        self.paused = False
+        
+        # Sensor fusion: samples are queued per device (topic) and filtered in batches
+        self.orientation_filter = OrientationFilter()
+        self.pending = {}
+        self.held = {}  # device -> samples kept back for forwarded ones to catch up
         
-        # Initialize MQTT client
-        client_id = f'imu_client_{time.time()}'
-        self.client = mqtt.Client(client_id=client_id)
+        # Initialize MQTT v5 client with a stable id for session resumption
+        self.client_id = consumer_client_id(name, index, self.group)
+        self.client = mqtt.Client(client_id=self.client_id, protocol=mqtt.MQTTv5)
         
         # Only set username/password if they are provided in settings
         if Settings.MQTT_USERNAME and Settings.MQTT_PASSWORD:
@@ -34,14 +87,25 @@ class IMUClient:
         self.client.on_message = self.on_message
         self.client.on_disconnect = self.on_disconnect
         
-        logger.info("IMU MQTT client initialized")
+        logger.info(f"IMU MQTT client {self.client_id} initialized")
 
-    def on_connect(self, client, userdata, flags, rc):
+    def connect(self):
+        """Connect, resuming the persistent session if the broker still has it"""
+        properties = Properties(PacketTypes.CONNECT)
+        properties.SessionExpiryInterval = Settings.MQTT_SESSION_EXPIRY
+        logger.info(f"Connecting to local MQTT broker at {Settings.MQTT_HOST}:{Settings.MQTT_PORT}")
+        self.client.connect(Settings.MQTT_HOST, Settings.MQTT_PORT, Settings.MQTT_KEEPALIVE,
+                            clean_start=False, properties=properties)
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
         """Callback for when client connects to the broker"""
         if rc == 0:
-            logger.info("Connected to local MQTT broker")
-            client.subscribe(Settings.MQTT_TOPIC)
-            logger.info(f"Subscribed to topic: {Settings.MQTT_TOPIC}")
+            resumed = flags.get('session present')
+            logger.info(f"Connected to local MQTT broker as {self.client_id} "
+                        f"({'resumed' if resumed else 'new'} session)")
+            # Harmless when the session already holds the subscription
+            client.subscribe(self.subscription, qos=Settings.MQTT_QOS)
+            logger.info(f"Subscribed to topic: {self.subscription}")
         else:
             logger.error(f"Connection to local broker failed with code {rc}")
 
@@ -54,26 +118,30 @@ class IMUClient:
             
             # Check if the message contains IMU data
             if isinstance(values, list) and len(values) == 2:
+                if not self.gate.admit():
+                    return
                 acc = list(values[0])
                 gyro = list(values[1])
+                readings = []
                 
                 # Store accelerometer data
                 for i, value in enumerate(['x', 'y', 'z']):
-                    self.data_buffer.add_data(f'imu_acc', acc[i])
-                    self.db_service.save_sensor_data(
-                        sensor_type='imu_accelerometer',
-                        value_type=f'acc_{value}',
-                        value=acc[i]
-                    )
+                    readings.append((f'acc_{value}', acc[i], None))
                 
                 # Store gyroscope data
                 for i, value in enumerate(['x', 'y', 'z']):
-                    self.data_buffer.add_data(f'imu_gyro', gyro[i])
-                    self.db_service.save_sensor_data(
-                        sensor_type='imu_gyroscope',
-                        value_type=f'gyro_{value}',
-                        value=gyro[i]
-                    )
+                    readings.append((f'gyro_{value}', gyro[i], None))
+                
+                readings = self.gate.persist(readings)
+                if readings:
+                    self.db_service.save_sensor_batch(self.storage, readings)
+                
+                received = time.time()
+                if self.forward is None:
+                    self.receive_sample(msg.topic, received, acc, gyro)
+                else:
+                    # Batched like fusion input, then forwarded by flush_fusion
+                    self.queue_fusion_sample(msg.topic, received, acc, gyro)
 
                 logger.debug(f"Processed IMU data - Acc: {acc}, Gyro: {gyro}")
             else:
@@ -84,20 +152,311 @@ class IMUClient:
         except Exception as e:
             logger.error(f"Error processing IMU message: {e}")
 
-    def on_disconnect(self, client, userdata, rc):
+    def receive_sample(self, device: str, timestamp: float, acc, gyro):
+        """Buffer one of the collector's own samples and queue it for fusion"""
+        self.receive_samples(device, [(timestamp, acc, gyro)])
+
+    def receive_samples(self, device: str, samples):
+        """
+        Buffer samples and queue them for fusion
+        
+        Called for the collector's own messages and for the batches forwarded
+        by the other consumers of the share group.
+        
+        Args:
+            device (str): Device identifier (the MQTT topic)
+            samples: (timestamp, acc, gyro) tuples
+        """
+        for timestamp, acc, gyro in samples:
+            # One (x, y, z) entry per sample, so readers can split the axes
+            self.data_buffer.add_data(f'{self.name}_acc', tuple(acc), timestamp)
+            self.data_buffer.add_data(f'{self.name}_gyro', tuple(gyro), timestamp)
+        self.queue_fusion_samples(device, samples)
+
+    def queue_fusion_sample(self, device: str, timestamp: float, acc, gyro):
+        """
+        Queue a sample for orientation estimation, flushing full or stale batches
+        
+        Args:
+            device (str): Device identifier (the MQTT topic)
+            timestamp (float): Arrival time in seconds since the epoch
+            acc: Accelerometer x, y, z
+            gyro: Gyroscope x, y, z
+        """
+        self.queue_fusion_samples(device, [(timestamp, acc, gyro)])
+
+    def queue_fusion_samples(self, device: str, samples):
+        pending = self.pending.setdefault(device, [])
+        pending.extend(samples)
+        
+        if (len(pending) - self.held.get(device, 0) >= Settings.IMU_FUSION_BATCH
+                or pending[-1][0] - pending[0][0] >= self.batch_delay):
+            self.flush_fusion(device)
+
+    @property
+    def batch_delay(self) -> float:
+        """Seconds a queued sample may wait before its batch is fused or forwarded"""
+        if self.forward is not None:
+            return Settings.IMU_FORWARD_MAX_DELAY
+        return Settings.IMU_FUSION_MAX_DELAY
+
+    def flush_stale(self, now: float = None):
+        """Fuse (or forward) devices whose oldest queued sample waited batch_delay"""
+        now = now or time.time()
+        for device, samples in list(self.pending.items()):
+            if samples and now - samples[0][0] >= self.batch_delay:
+                self.flush_fusion(device)
+
+    def flush_fusion(self, device: str = None):
+        """
+        Run the orientation filter over queued samples and store the result
+        
+        With a forward sink the batch goes to the collector instead.
+        """
+        devices = [device] if device is not None else list(self.pending.keys())
+        
+        for name in devices:
+            samples = self.pending.pop(name, [])
+            if self.forward is not None:
+                if samples:
+                    self.forward_samples(name, samples)
+                continue
+            
+            # Forwarded samples can arrive slightly out of order; ones older
+            # than what the filter already consumed are dropped
+            samples.sort(key=lambda sample: sample[0])
+            if self.group:
+                # Extra consumers send a batch up to IMU_FORWARD_MAX_DELAY after its
+                # first sample, checked every half delay; fusing only what is older
+                # than twice that lets their batches still merge in order
+                cutoff = time.time() - 2 * Settings.IMU_FORWARD_MAX_DELAY
+                split = len(samples)
+                while split and samples[split - 1][0] > cutoff:
+                    split -= 1
+                samples, held = samples[:split], samples[split:]
+                if held:
+                    self.pending[name] = held
+                    self.held[name] = len(held)
+                else:
+                    self.held.pop(name, None)
+            state = self.orientation_filter.states.get(name)
+            if state is not None:
+                fresh = [sample for sample in samples if sample[0] >= state[3]]
+                if len(fresh) < len(samples):
+                    metrics.inc(f'mqtt.{self.name}.late_samples', len(samples) - len(fresh))
+                samples = fresh
+            if not samples:
+                continue
+            
+            try:
+                timestamps = [sample[0] for sample in samples]
+                orientation = self.orientation_filter.process(
+                    name,
+                    timestamps,
+                    [sample[1] for sample in samples],
+                    [sample[2] for sample in samples]
+                )
+                
+                readings = []
+                for timestamp, (roll, pitch, yaw) in zip(timestamps, orientation.tolist()):
+                    self.data_buffer.add_data(f'{self.name}_orientation', (roll, pitch, yaw))
+                    moment = datetime(1970, 1, 1) + timedelta(seconds=timestamp)
+                    readings.extend([
+                        ('roll', roll, moment),
+                        ('pitch', pitch, moment),
+                        ('yaw', yaw, moment)
+                    ])
+                # Fused readings are rolled up like the raw ones
+                readings = self.gate.persist(readings)
+                if readings:
+                    self.db_service.save_sensor_batch(self.storage, readings)
+                
+                logger.debug(f"Fused {len(samples)} IMU samples from {name}")
+            except Exception as e:
+                logger.error(f"Error fusing IMU samples from {name}: {e}")
+
+    def forward_samples(self, device: str, samples):
+        """Send one fusion batch to the collector as a single datagram"""
+        try:
+            self.forward.submit_samples(self.name, device, samples)
+        except SinkUnavailable as e:
+            metrics.inc(f'mqtt.{self.name}.unforwarded', len(samples))
+            logger.debug(f"Could not forward {len(samples)} IMU samples to the collector: {e}")
+
+    def on_disconnect(self, client, userdata, rc, properties=None):
         """Callback for when client disconnects"""
         logger.warning(f"Disconnected from local broker with code: {rc}")
         if rc != 0:
             logger.info("Attempting to reconnect to local broker...")
 
+    def pause(self):
+        """
+        Stop reading the broker socket under backpressure
+        
+        Unread messages stay in the broker's send queue and the TCP window, so
+        the broker throttles delivery; a pause longer than the keepalive drops
+        the connection and run_async reconnects.
+        """
+        self.paused = True
+        sock = self.client.socket()
+        if self.loop is not None and sock is not None:
+            self.loop.remove_reader(sock)
+        logger.warning(f"Pausing {self.name} MQTT delivery")
+
+    def resume(self):
+        self.paused = False
+        sock = self.client.socket()
+        if self.loop is not None and sock is not None:
+            self.loop.add_reader(sock, self.client.loop_read)
+        logger.info(f"Resuming {self.name} MQTT delivery")
+
+    def call_on_loop(self, callback, *args):
+        """
+        Run a socket registration on the event loop
+        
+        paho fires the socket callbacks from whichever thread calls connect(),
+        which for run_async is an executor thread.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            callback(*args)
+        elif not self.loop.is_closed():  # paho also closes the socket on garbage collection
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def on_socket_open(self, client, userdata, sock):
+        self.call_on_loop(self.add_socket_reader, client, sock)
+
+    def add_socket_reader(self, client, sock):
+        # Checked on the loop, where pause() and resume() run
+        if not self.paused:
+            self.loop.add_reader(sock, client.loop_read)
+
     def run(self):
         """Main client loop"""
         while True:
             try:
-                logger.info(f"Connecting to local MQTT broker at {Settings.MQTT_HOST}:{Settings.MQTT_PORT}")
-                self.client.connect(Settings.MQTT_HOST, Settings.MQTT_PORT, 60)
-                self.client.loop_forever()
+                self.connect()
+                
+                # A device that went quiet still gets its last partial batch fused
+                while self.client.loop(timeout=min(1.0, self.batch_delay / 2)) == mqtt.MQTT_ERR_SUCCESS:
+                    self.flush_stale()
             except Exception as e:
                 logger.error(f"Local MQTT connection error: {e}")
                 logger.info("Retrying in 5 seconds...")
-                time.sleep(5)  # Wait before retrying
\ No newline at end of file
+                time.sleep(5)  # Wait before retrying
+
+    async def run_async(self):
+        """
+        Client loop driven by the running asyncio event loop
+        
+        The paho socket is registered with the loop's reader/writer callbacks,
+        so no dedicated network thread is needed. Only the blocking connect
+        (DNS lookup and TCP handshake) runs in the default executor.
+        """
+        loop = self.loop = asyncio.get_running_loop()
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = lambda client, userdata, sock: self.call_on_loop(
+            loop.remove_reader, sock)
+        self.client.on_socket_register_write = lambda client, userdata, sock: self.call_on_loop(
+            loop.add_writer, sock, client.loop_write)
+        self.client.on_socket_unregister_write = lambda client, userdata, sock: self.call_on_loop(
+            loop.remove_writer, sock)
+        
+        while True:
+            try:
+                await loop.run_in_executor(None, self.connect)
+                
+                # Keepalives, retries and stale fusion batches; exits once
+                # the connection is lost
+                while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+                    self.flush_stale()
+                    await asyncio.sleep(min(1.0, self.batch_delay / 2))
+            except Exception as e:
+                logger.error(f"Local MQTT connection error: {e}")
+            
+            self.flush_fusion()
+            logger.info("Retrying in 5 seconds...")
+            await asyncio.sleep(5)
+
+def run_consumer(name: str, index: int):
+    """
+    Run one standalone IMU consumer of the shared subscription
+    
+    Readings are stored from this process; the samples are also forwarded in
+    batches to the collector on this host (Settings.INGEST_SOCKET) for its
+    buffers and orientation fusion.
+    
+    Args:
+        name (str): MQTT sensor in the registry
+        index (int): Consumer number on this node, unique per process
+    """
+    from config.registry import load_registry
+    from services.database_service import DatabaseService
+    from services.overload import OverloadController
+    from services.spool import Spool, SpoolReplayer
+    from services.storage_writer import StorageWriter
+    from utils.data_buffer import DataBuffer
+    
+    logging.basicConfig(level=logging.INFO)
+    sensor = next((sensor for sensor in load_registry()
+                   if sensor.name == name and sensor.protocol == 'mqtt'), None)
+    if sensor is None:
+        raise SystemExit(f"No mqtt sensor named {name} in {Settings.SENSOR_REGISTRY}")
+    
+    # Each process spools to its own directory so segment files never collide
+    spool = Spool(os.path.join(Settings.SPOOL_DIR, f"{name}-{index}"))
+    db_service = DatabaseService(spool=spool)
+    db_service.register_storage(sensor.storage_target, sensor.database_url, sensor.channels)
+    threading.Thread(target=SpoolReplayer(spool, db_service).run, daemon=True).start()
+    writer = StorageWriter(db_service)
+    threading.Thread(target=writer.run, daemon=True).start()
+    
+    overload = OverloadController(db_service, writer)
+    client = IMUClient(
+        DataBuffer(),
+        writer,
+        name=sensor.name,
+        topic=sensor.topic,
+        storage=sensor.storage_target,
+        priority=sensor.priority,
+        rollup=sensor.rollup,
+        overload=overload,
+        index=index,
+        forward=IPCSink()  # Buffers and fusion live in the collector
+    )
+    overload.register(client, sensor.priority)
+    
+    async def serve():
+        await asyncio.gather(client.run_async(), overload.run())
+    
+    asyncio.run(serve())
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run extra IMU consumers sharing the MQTT subscription with the collector")
+    parser.add_argument("--sensor", default="imu", help="MQTT sensor in the registry")
+    parser.add_argument("--instances", type=int, default=Settings.MQTT_CONSUMERS,
+                        help="Consumer processes to start")
+    parser.add_argument("--first-index", type=int, default=1,
+                        help="Index of the first consumer; the collector's own client is 0")
+    args = parser.parse_args()
+    
+    if not Settings.MQTT_SHARE_GROUP:
+        raise SystemExit("Settings.MQTT_SHARE_GROUP is not set; every consumer would "
+                         "receive every message")
+    
+    processes = [
+        multiprocessing.Process(target=run_consumer, args=(args.sensor, index),
+                                name=f"{args.sensor}-consumer-{index}")
+        for index in range(args.first_index, args.first_index + args.instances)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Overload controller: graceful degradation when ingest outruns storage
+
+Modes escalate with the worst of commit latency, event loop lag, storage
+writer queue depth and spool backlog:
+
+    normal        everything is buffered and stored
+    decimate      low-priority sensors keep one reading in OVERLOAD_DECIMATION
+    rollup        sensors with rollup: true store window means instead of readings
+    backpressure  senders of non-high-priority sensors are paused or told to retry
+
+Escalation is immediate; stepping down waits OVERLOAD_COOLDOWN seconds per level.
+"""
+import asyncio
+import time
+from datetime import datetime
+from config.settings import Settings
+from utils.metrics import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+NORMAL, DECIMATE, ROLLUP, BACKPRESSURE = range(4)
+MODE_NAMES = ('normal', 'decimate', 'rollup', 'backpressure')
+
+def level(value: float, thresholds) -> int:
+    """Mode a signal asks for, given its (decimate, rollup, backpressure) thresholds"""
+    return sum(value >= threshold for threshold in thresholds)
+
+class OverloadController:
+    def __init__(self, db_service, writer=None):
+        """
+        Args:
+            db_service: DatabaseService whose commit latency and spool are watched
+            writer (optional): StorageWriter whose queue depth is watched
+        """
+        self.db_service = db_service
+        self.writer = writer
+        self.mode = NORMAL
+        self.lowered_since = None
+        self.loop_lag = 0.0
+        self.throttled = []  # (priority, listener) with pause()/resume()
+        metrics.set_gauge('overload.mode', self.mode)
+
+    def register(self, listener, priority: str = 'normal'):
+        """Add a front-end that can pause its senders (pause()/resume())"""
+        self.throttled.append((priority, listener))
+        if self.mode == BACKPRESSURE and priority != 'high':
+            listener.pause()
+
+    def rejecting(self, priority: str) -> bool:
+        """Whether new readings of this priority should be refused"""
+        return self.mode == BACKPRESSURE and priority != 'high'
+
+    def signals(self, now: float = None) -> dict:
+        # Latency is only measured on commit; once a database has not committed
+        # for OVERLOAD_LATENCY_STALE seconds (e.g. its writers are paused) its
+        # last value says nothing about now and would keep the mode stuck
+        now = now or time.time()
+        last_commit = self.db_service.last_commit
+        latency = max((value for name, value in list(self.db_service.commit_latency.items())
+                       if now - last_commit.get(name, 0) < Settings.OVERLOAD_LATENCY_STALE),
+                      default=0.0)
+        spool = self.db_service.spool
+        return {
+            'commit_latency': latency,
+            'loop_lag': self.loop_lag,
+            'write_queue': self.writer.depth if self.writer is not None else 0,
+            'spool_bytes': spool.total_bytes if spool is not None else 0
+        }
+
+    def target(self, signals: dict) -> int:
+        return max(
+            level(signals['commit_latency'], Settings.OVERLOAD_COMMIT_LATENCY),
+            level(signals['loop_lag'], Settings.OVERLOAD_LOOP_LAG),
+            level(signals['write_queue'], Settings.OVERLOAD_WRITE_QUEUE),
+            level(signals['spool_bytes'], Settings.OVERLOAD_SPOOL_BYTES)
+        )
+
+    def evaluate(self, now: float = None):
+        """Recompute the mode from the current signals"""
+        now = now or time.time()
+        signals = self.signals(now)
+        for name, value in signals.items():
+            metrics.set_gauge(f'overload.{name}', value)
+
+        target = self.target(signals)
+        if target > self.mode:
+            self.lowered_since = None
+            self.set_mode(target, signals)
+        elif target < self.mode:
+            # Step down one level at a time once the signals stayed low long enough
+            if self.lowered_since is None:
+                self.lowered_since = now
+            elif now - self.lowered_since >= Settings.OVERLOAD_COOLDOWN:
+                self.lowered_since = now
+                self.set_mode(self.mode - 1, signals)
+        else:
+            self.lowered_since = None
+
+    def set_mode(self, mode: int, signals: dict = None):
+        previous, self.mode = self.mode, mode
+        metrics.inc('overload.mode_changes')
+        metrics.inc(f'overload.entered.{MODE_NAMES[mode]}')
+        metrics.set_gauge('overload.mode', mode)
+        logger.warning(f"Overload mode {MODE_NAMES[previous]} -> {MODE_NAMES[mode]} "
+                       f"({signals})")
+
+        if mode == BACKPRESSURE or previous == BACKPRESSURE:
+            for priority, listener in self.throttled:
+                if priority == 'high':
+                    continue
+                try:
+                    if mode == BACKPRESSURE:
+                        listener.pause()
+                    else:
+                        listener.resume()
+                except Exception as e:
+                    logger.error(f"Error applying backpressure: {e}")
+
+    async def run(self):
+        """Evaluate periodically; the sleep overshoot measures event loop lag"""
+        interval = Settings.OVERLOAD_INTERVAL
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            self.loop_lag = max(time.monotonic() - started - interval, 0.0)
+            try:
+                self.evaluate()
+            except Exception as e:
+                logger.error(f"Error evaluating overload: {e}")
+
+class SensorGate:
+    def __init__(self, name: str, priority: str = 'normal', rollup: bool = False,
+                 controller: OverloadController = None):
+        """
+        Decide per reading what a sensor keeps under the current mode
+
+        Args:
+            name (str): Sensor name, for metrics
+            priority (str): 'low' readings are decimated, 'high' ones never shed
+            rollup (bool): Store window means while in rollup mode
+            controller (optional): OverloadController; without one nothing is shed
+        """
+        self.name = name
+        self.priority = priority
+        self.rollup = rollup
+        self.controller = controller
+        self.skipped = 0
+        self.windows = {}  # value_type -> [window start, sum, count]
+
+    @property
+    def mode(self) -> int:
+        return self.controller.mode if self.controller is not None else NORMAL
+
+    def admit(self) -> bool:
+        """False if this reading is dropped for both buffer and storage"""
+        if self.mode < DECIMATE or self.priority != 'low':
+            return True
+        self.skipped = (self.skipped + 1) % Settings.OVERLOAD_DECIMATION
+        if self.skipped:
+            metrics.inc(f'overload.decimated.{self.name}')
+            return False
+        return True
+
+    def persist(self, readings) -> list:
+        """
+        Readings to store for the ones just received
+
+        Args:
+            readings: (value_type, value, timestamp) tuples; timestamp may be None
+
+        Returns:
+            list: (value_type, value, timestamp) tuples for save_sensor_batch
+        """
+        rolling = self.rollup and self.priority != 'high' and self.mode >= ROLLUP
+        if not rolling:
+            return self.flush() + list(readings) if self.windows else list(readings)
+
+        now = time.time()
+        completed = []
+        for value_type, value, _ in readings:
+            window = self.windows.get(value_type)
+            if window is None:
+                window = self.windows[value_type] = [now, 0.0, 0]
+            elif now - window[0] >= Settings.OVERLOAD_ROLLUP_WINDOW:
+                completed.append(self._mean(value_type, window))
+                window = self.windows[value_type] = [now, 0.0, 0]
+            window[1] += value
+            window[2] += 1
+        metrics.inc(f'overload.rolled_up.{self.name}', len(readings))
+        return completed
+
+    def flush(self) -> list:
+        """Means of every open rollup window"""
+        completed = [self._mean(value_type, window)
+                     for value_type, window in self.windows.items()]
+        self.windows = {}
+        return completed
+
+    @staticmethod
+    def _mean(value_type, window) -> tuple:
+        started, total, count = window
+        return value_type, total / count, datetime.utcfromtimestamp(started)
@@ -0,0 +1,166 @@
+"""
+On-demand profiling of the live collector process
+
+A session samples the stacks of every thread with sys._current_frames() and
+records allocations with tracemalloc. Nothing is installed while no session
+runs, so it costs nothing when idle.
+"""
+import io
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import zipfile
+from collections import Counter
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ProfilingSession:
+    def __init__(self, interval: float, top: int, trace_frames: int = 10):
+        """
+        Args:
+            interval (float): Seconds between stack samples
+            top (int): Entries in the CPU and allocation top-N reports
+            trace_frames (int): Frames kept per tracemalloc allocation
+        """
+        self.interval = interval
+        self.top = top
+        self.trace_frames = trace_frames
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_tracemalloc = False
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def _sample(self):
+        """Take one sample of every thread's stack except the sampler's own"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+                             f"{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.started = time.time()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self.started_tracemalloc = True
+        self.thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.elapsed = time.time() - self.started
+
+    def release(self):
+        """Stop tracemalloc if this session started it; reports need it until then"""
+        if self.started_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.started_tracemalloc = False
+
+    def cpu_report(self) -> str:
+        """Top functions by samples on-CPU (self) and on-stack (total)"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack[1:]):
+                total[function] += count
+
+        lines = [f"{self.samples} samples over {self.elapsed:.1f}s "
+                 f"({self.interval * 1000:.1f} ms interval), all threads", ""]
+        lines.append(f"{'self':>8} {'total':>8}  function")
+        for function, count in own.most_common(self.top):
+            lines.append(f"{count:>8} {total[function]:>8}  {function}")
+        lines += ["", f"{'total':>8}  function (cumulative)"]
+        for function, count in total.most_common(self.top):
+            lines.append(f"{count:>8}  {function}")
+        return "\n".join(lines) + "\n"
+
+    def collapsed_stacks(self) -> str:
+        """Stacks in collapsed format for flamegraph.pl or speedscope"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.items())
+
+    def allocation_report(self) -> str:
+        """Top allocation sites still live at the end of the session"""
+        if not tracemalloc.is_tracing():
+            return "tracemalloc not active\n"
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+        stats = snapshot.statistics('lineno')
+        size = sum(stat.size for stat in stats)
+        lines = [f"{size / 1024:.1f} KiB in {len(stats)} allocation sites "
+                 f"traced since session start", ""]
+        for stat in stats[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+    def archive(self) -> bytes:
+        """All reports as a zip file"""
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("cpu_top.txt", self.cpu_report())
+            archive.writestr("cpu.collapsed", self.collapsed_stacks())
+            archive.writestr("alloc_top.txt", self.allocation_report())
+        return output.getvalue()
+
+class Profiler:
+    def __init__(self):
+        """Runs at most one profiling session at a time"""
+        self.lock = threading.Lock()
+        self.active = None
+
+    def begin(self, interval: float, top: int):
+        """
+        Start a session
+
+        Returns:
+            ProfilingSession, or None if one is already running
+        """
+        with self.lock:
+            if self.active is not None:
+                return None
+            self.active = ProfilingSession(interval, top)
+            self.active.start()
+            logger.info("Profiling session started")
+            return self.active
+
+    def end(self, session: ProfilingSession) -> bytes:
+        """Stop the session and return its reports as a zip file"""
+        try:
+            session.stop()
+            return session.archive()
+        finally:
+            # Tracing slows every allocation; never leave it running on failure
+            session.release()
+            with self.lock:
+                self.active = None
+            logger.info(f"Profiling session finished with {session.samples} samples")
+
+    @staticmethod
+    def filename() -> str:
+        return f"profile-{datetime.utcnow():%Y%m%dT%H%M%S}.zip"
@@ -0,0 +1,117 @@
+"""
+Ingest sinks: where protocol front-ends hand decoded readings to
+"""
+import json
+import socket
+from config.settings import Settings
+from services.overload import SensorGate
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SinkUnavailable(Exception):
+    """Raised when a sink cannot accept readings right now"""
+
+class SinkOverloaded(SinkUnavailable):
+    """Raised when a sink is shedding load; the sender should retry later"""
+
+class LocalSink:
+    def __init__(self, data_buffer, db_service, overload=None):
+        """
+        Sink for front-ends running inside the collector process
+
+        Args:
+            data_buffer: DataBuffer instance for storing readings
+            db_service: StorageWriter (or DatabaseService) the readings are saved through
+            overload (optional): OverloadController deciding what is shed
+        """
+        self.data_buffer = data_buffer
+        self.db_service = db_service
+        self.overload = overload
+        self.gates = {}
+
+    def gate(self, sensor) -> SensorGate:
+        gate = self.gates.get(sensor.name)
+        if gate is None:
+            gate = self.gates[sensor.name] = SensorGate(
+                sensor.name, sensor.priority, sensor.rollup, self.overload)
+        return gate
+
+    def submit(self, sensor, value: float):
+        self.submit_many(sensor, [value])
+
+    def submit_many(self, sensor, values):
+        """Buffer the admitted values and save them in one batch"""
+        gate = self.gate(sensor)
+        readings = []
+        for value in values:
+            if not gate.admit():
+                continue
+            self.data_buffer.add_data(sensor.name, value)
+            readings.append(('value', value, None))
+        readings = gate.persist(readings)
+        if readings:
+            self.db_service.save_sensor_batch(sensor.storage_target, readings)
+
+class StorageSink:
+    def __init__(self, db_service):
+        """
+        Sink writing straight to storage, for workers without a collector
+
+        Args:
+            db_service: StorageWriter (or DatabaseService) the readings are saved through
+        """
+        self.db_service = db_service
+
+    def submit(self, sensor, value: float):
+        self.db_service.save_sensor_data(
+            sensor_type=sensor.storage_target,
+            value_type='value',
+            value=value
+        )
+
+    def submit_many(self, sensor, values):
+        self.db_service.save_sensor_batch(
+            sensor.storage_target, [('value', value, None) for value in values])
+
+class IPCSink:
+    def __init__(self, path: str = None):
+        """
+        Sink forwarding readings to the collector over a Unix datagram socket
+
+        Args:
+            path (str, optional): Collector socket, defaults to Settings.INGEST_SOCKET
+        """
+        self.path = path or Settings.INGEST_SOCKET
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def submit(self, sensor, value: float):
+        self._send({'sensor': sensor.name, 'value': value})
+
+    def _send(self, message: dict):
+        message = json.dumps(message).encode()
+        try:
+            self.sock.sendto(message, self.path)
+        except BlockingIOError as e:
+            # Collector's receive queue is full (or it paused reading under overload)
+            raise SinkOverloaded(f"Collector is behind: {e}")
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise SinkUnavailable(f"Collector not accepting readings: {e}")
+
+    def submit_samples(self, name: str, device: str, samples):
+        """
+        Forward a batch of one device's IMU samples for the collector's buffers
+        and fusion, as one datagram (about 100 bytes per sample)
+
+        Args:
+            name (str): IMU sensor name
+            device (str): Device identifier (the MQTT topic)
+            samples: (timestamp, acc, gyro) tuples
+        """
+        self._send({'sensor': name, 'device': device,
+                    'samples': [[timestamp, list(acc), list(gyro)]
+                                for timestamp, acc, gyro in samples]})
+
+    def close(self):
+        self.sock.close()
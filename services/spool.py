@@ -0,0 +1,292 @@
+"""
+Durable on-disk spool for readings the database cannot take right now
+"""
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+from struct import Struct
+from threading import Lock
+from config.settings import Settings
+from utils.gorilla import to_micros, from_micros
+from utils.metrics import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length and CRC32 of the payload
+HEADER = Struct('<II')
+SEGMENT_SUFFIX = ".spool"
+
+class Spool:
+    def __init__(self, directory: str = None):
+        """
+        Initialize an append-only spool of segment files
+
+        Args:
+            directory (str, optional): Spool directory, defaults to Settings.SPOOL_DIR
+        """
+        self.directory = directory or Settings.SPOOL_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = Lock()
+
+        self.active = None
+        self.active_path = None
+        self.active_size = 0
+        self.active_sensor_types = set()  # Databases with readings in the active segment
+        self.unsynced = 0
+        self.last_sync = time.time()
+
+        segments = self.segments()
+        self.next_segment = (int(os.path.basename(segments[-1])[:-len(SEGMENT_SUFFIX)]) + 1
+                             if segments else 0)
+        self.total_bytes = sum(os.path.getsize(path) for path in segments)
+        self.update_gauges()
+
+        if segments:
+            logger.info(f"Spool has {len(segments)} segments ({self.total_bytes} bytes) to replay")
+
+    def segments(self) -> list:
+        """All segment paths, oldest first"""
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def sealed_segments(self) -> list:
+        """Segments no longer written to, oldest first"""
+        with self.lock:
+            return [path for path in self.segments() if path != self.active_path]
+
+    def has_backlog(self) -> bool:
+        return self.total_bytes > 0
+
+    def update_gauges(self):
+        metrics.set_gauge('spool.bytes', self.total_bytes)
+        metrics.set_gauge('spool.segments', len(self.segments()))
+
+    def append(self, sensor_type: str, value_type, value: float, timestamp: datetime):
+        """
+        Append one reading durably (fsync is batched)
+
+        Args:
+            sensor_type (str): Database the reading belongs to
+            value_type (str): Channel for multi-axis sensors, else None
+            value (float): The reading
+            timestamp (datetime): Ingest time, preserved on replay
+        """
+        payload = json.dumps({
+            's': sensor_type,
+            't': value_type,
+            'v': value,
+            'ts': to_micros(timestamp)
+        }, separators=(',', ':')).encode()
+        record = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with self.lock:
+            if self.active is None:
+                self._open_segment()
+            self.active.write(record)
+            self.active_size += len(record)
+            self.active_sensor_types.add(sensor_type)
+            self.total_bytes += len(record)
+            self.unsynced += 1
+
+            if (self.unsynced >= Settings.SPOOL_FSYNC_RECORDS
+                    or time.time() - self.last_sync >= Settings.SPOOL_FSYNC_INTERVAL):
+                self._sync()
+            if self.active_size >= Settings.SPOOL_SEGMENT_BYTES:
+                self._close_segment()
+            if self.total_bytes > Settings.SPOOL_MAX_BYTES:
+                self._drop_oldest()
+
+        metrics.inc('spool.appended')
+
+    def _open_segment(self):
+        self.active_path = os.path.join(self.directory,
+                                        f"{self.next_segment:012d}{SEGMENT_SUFFIX}")
+        self.next_segment += 1
+        self.active = open(self.active_path, 'ab')
+        self.active_size = 0
+
+    def _sync(self):
+        if self.active is not None:
+            self.active.flush()
+            os.fsync(self.active.fileno())
+        self.unsynced = 0
+        self.last_sync = time.time()
+
+    def _close_segment(self):
+        if self.active is not None:
+            self._sync()
+            self.active.close()
+        self.active = None
+        self.active_path = None
+        self.active_size = 0
+        self.active_sensor_types = set()
+
+    def _drop_oldest(self):
+        """Keep disk usage bounded by discarding the oldest sealed segments"""
+        for path in self.segments():
+            if self.total_bytes <= Settings.SPOOL_MAX_BYTES:
+                break
+            if path == self.active_path:
+                continue
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.total_bytes -= size
+            metrics.inc('spool.dropped_bytes', size)
+            logger.error(f"Spool full, dropped segment {path} ({size} bytes)")
+
+    def sync(self):
+        """Flush pending records; called periodically by the replayer"""
+        with self.lock:
+            if self.unsynced:
+                self._sync()
+
+    def seal(self):
+        """Close the active segment so it can be replayed"""
+        with self.lock:
+            self._close_segment()
+
+    def pending_sensor_types(self) -> set:
+        """Databases the active segment holds readings for"""
+        with self.lock:
+            return set(self.active_sensor_types)
+
+    def read_segment(self, path: str):
+        """
+        Read every intact record of a segment
+
+        Returns:
+            list: (sensor_type, value_type, value, timestamp) tuples
+        """
+        records = []
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            length, checksum = HEADER.unpack_from(data, offset)
+            payload = data[offset + HEADER.size:offset + HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                # Torn write at the tail (crash before fsync); nothing after it is trusted
+                metrics.inc('spool.corrupt_records')
+                logger.warning(f"Corrupt record in {path} at offset {offset}, skipping rest")
+                break
+            record = json.loads(payload)
+            records.append((record['s'], record['t'], record['v'], from_micros(record['ts'])))
+            offset += HEADER.size + length
+        return records
+
+    def remove(self, path: str):
+        with self.lock:
+            if os.path.exists(path):
+                self.total_bytes = max(0, self.total_bytes - os.path.getsize(path))
+                os.remove(path)
+        self.update_gauges()
+
+class SpoolReplayer:
+    def __init__(self, spool: Spool, db_service):
+        """
+        Initialize replayer draining the spool into the database
+
+        Args:
+            spool: Spool to drain
+            db_service: DatabaseService the readings are inserted into
+        """
+        self.spool = spool
+        self.db_service = db_service
+        self.running = True
+
+    def replay_segment(self, path: str) -> bool:
+        """
+        Bulk insert one sealed segment
+
+        Returns:
+            bool: True if the segment was consumed, False to retry later
+        """
+        records = self.spool.read_segment(path)
+        groups = {}
+        for sensor_type, value_type, value, timestamp in records:
+            groups.setdefault(sensor_type, []).append((value_type, value, timestamp))
+
+        # Leave the segment alone until every database it needs is reachable
+        for sensor_type in groups:
+            if not self.db_service.is_available(sensor_type):
+                return False
+
+        started = time.time()
+        replayed = 0
+        for sensor_type, readings in groups.items():
+            replayed += self.replay_readings(sensor_type, readings)
+
+        # Readings requeued above sit in the active segment's write buffer;
+        # make them durable before the only other copy goes away
+        self.spool.sync()
+        self.spool.remove(path)
+        elapsed = max(time.time() - started, 1e-6)
+        metrics.inc('spool.replayed', replayed)
+        metrics.set_gauge('spool.replay_rate', replayed / elapsed)
+        logger.info(f"Replayed {replayed} spooled readings from {path}")
+        return True
+
+    def replay_readings(self, sensor_type: str, readings) -> int:
+        """
+        Insert one database's readings in batches
+        
+        A batch the database rejects is bisected until the offending rows are
+        isolated, so only those are dropped; if the database goes away the
+        rest is requeued to the spool.
+        
+        Returns:
+            int: Number of readings inserted
+        """
+        size = Settings.SPOOL_REPLAY_BATCH
+        pending = [readings[i:i + size] for i in range(0, len(readings), size)][::-1]
+        replayed = 0
+        while pending:
+            batch = pending.pop()
+            try:
+                self.db_service.insert_batch(sensor_type, batch)
+                replayed += len(batch)
+            except self.db_service.UNAVAILABLE_ERRORS as e:
+                # Database went away mid-replay; requeue what did not make it
+                logger.error(f"Error replaying {sensor_type} readings: {e}")
+                for rest in [batch] + pending[::-1]:
+                    for value_type, value, timestamp in rest:
+                        self.spool.append(sensor_type, value_type, value, timestamp)
+                break
+            except Exception as e:
+                if len(batch) == 1:
+                    metrics.inc('spool.rejected')
+                    logger.error(f"Dropping {sensor_type} reading {batch[0]} "
+                                 f"rejected by the database: {e}")
+                else:
+                    middle = len(batch) // 2
+                    pending.append(batch[middle:])
+                    pending.append(batch[:middle])
+        return replayed
+
+    def ready(self, sensor_types) -> bool:
+        return all(self.db_service.is_available(sensor_type) for sensor_type in sensor_types)
+
+    def run(self):
+        """Main replay loop"""
+        logger.info("Starting spool replayer")
+
+        while self.running:
+            try:
+                self.spool.sync()
+                if self.spool.has_backlog():
+                    # Sealing while a database is still down would only leave
+                    # behind one small segment per interval
+                    if self.ready(self.spool.pending_sensor_types()):
+                        self.spool.seal()
+                    for path in self.spool.sealed_segments():
+                        if not self.replay_segment(path):
+                            break
+                self.spool.update_gauges()
+            except Exception as e:
+                logger.error(f"Error in spool replay loop: {e}")
+            time.sleep(Settings.SPOOL_REPLAY_INTERVAL)
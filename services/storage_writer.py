@@ -0,0 +1,103 @@
+"""
+Storage writer: database commits off the event loop
+
+Front-ends on the asyncio loop hand readings to StorageWriter.save_sensor_batch,
+which only queues them; a writer thread drains the queue, merges what piled
+up per database and commits each merge with DatabaseService.save_sensor_batch.
+"""
+import queue
+from datetime import datetime
+from config.settings import Settings
+from utils.metrics import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StorageWriter:
+    def __init__(self, db_service, max_pending: int = None):
+        """
+        Args:
+            db_service: DatabaseService the readings are committed to
+            max_pending (int, optional): Queued batches before new ones go straight
+                to the spool, defaults to Settings.WRITE_QUEUE_MAX
+        """
+        self.db_service = db_service
+        self.queue = queue.Queue(maxsize=max_pending or Settings.WRITE_QUEUE_MAX)
+        self.running = True
+
+    @property
+    def depth(self) -> int:
+        """Batches waiting to be committed"""
+        return self.queue.qsize()
+
+    def save_sensor_batch(self, sensor_type: str, readings) -> bool:
+        """
+        Queue readings for the writer thread; never blocks
+
+        Args:
+            sensor_type (str): Storage target, as for DatabaseService.save_sensor_batch
+            readings: Iterable of (value_type, value, timestamp) tuples; timestamp may be None
+
+        Returns:
+            bool: False if the readings were dropped
+        """
+        # Timestamps are fixed at ingest, not when the writer gets to them
+        now = datetime.utcnow()
+        readings = [(value_type, value, timestamp or now)
+                    for value_type, value, timestamp in readings]
+        try:
+            self.queue.put_nowait((sensor_type, readings))
+            return True
+        except queue.Full:
+            metrics.inc('writer.overflow', len(readings))
+            if self.db_service.spool_batch(sensor_type, readings):
+                return True
+            logger.error(f"Storage writer queue full, dropping {len(readings)} {sensor_type} readings")
+            return False
+
+    def save_sensor_data(self, sensor_type: str, value: float, value_type: str = None,
+                         timestamp: datetime = None) -> bool:
+        return self.save_sensor_batch(sensor_type, [(value_type, value, timestamp)])
+
+    def take(self, timeout: float = 1.0) -> dict:
+        """
+        Block for the next batch, then merge whatever else is queued
+
+        Returns:
+            dict: Storage target -> readings, at most Settings.WRITE_BATCH_MAX in total
+        """
+        try:
+            sensor_type, readings = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return {}
+        batches = {sensor_type: list(readings)}
+        total = len(readings)
+        while total < Settings.WRITE_BATCH_MAX:
+            try:
+                sensor_type, readings = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(sensor_type, []).extend(readings)
+            total += len(readings)
+        return batches
+
+    def run(self):
+        """Writer thread loop"""
+        logger.info("Starting storage writer")
+
+        while self.running:
+            batches = self.take()
+            for sensor_type, readings in batches.items():
+                self.db_service.save_sensor_batch(sensor_type, readings)
+                metrics.inc('writer.readings', len(readings))
+            metrics.set_gauge('writer.queue', self.depth)
+
+    def stop(self):
+        """Stop the loop and commit what is still queued"""
+        self.running = False
+        while True:
+            batches = self.take(timeout=0)
+            if not batches:
+                break
+            for sensor_type, readings in batches.items():
+                self.db_service.save_sensor_batch(sensor_type, readings)
@@ -1,10 +1,13 @@
 """
 TCP server implementation for temperature and gas sensors
 """
+import asyncio
 import socket
 from struct import unpack
 import time
 from config.settings import Settings
+from utils.decoders import FRAME_DECODERS
+from services.overload import SensorGate
 import logging
 
 logger = logging.getLogger(__name__)
@@ -107,4 +110,85 @@ class TCPServer:
             except Exception as e:
                 logger.error(f"Error in main server loop: {e}")
                 
-            time.sleep(0.01)  # Prevent CPU overload
\ No newline at end of file
+            time.sleep(0.01)  # Prevent CPU overload
+
+class AsyncTCPServer:
+    def __init__(self, sensor, data_buffer, db_service, overload=None):
+        """
+        Initialize an asyncio TCP listener for a registry-declared sensor
+        
+        Args:
+            sensor: SensorConfig with port, decoder and storage target
+            data_buffer: DataBuffer instance for storing readings
+            db_service: StorageWriter (or DatabaseService) the readings are saved through
+            overload (optional): OverloadController deciding what is shed
+        """
+        self.sensor = sensor
+        self.sensor_type = sensor.name
+        self.data_buffer = data_buffer
+        self.db_service = db_service
+        self.decoder = FRAME_DECODERS[sensor.decoder]
+        self.host = sensor.host or Settings.TCP_HOST
+        self.port = sensor.port
+        self.server = None
+        self.gate = SensorGate(sensor.name, sensor.priority, sensor.rollup, overload)
+        
+        # Cleared under backpressure: connections stop reading, the kernel
+        # buffers fill and senders block on a closed TCP window
+        self.flowing = asyncio.Event()
+        self.flowing.set()
+        
+        logger.info(f"TCP listener initialized for {self.sensor_type} on port {self.port}")
+
+    def process_value(self, value: float):
+        """Store a decoded reading"""
+        if not self.gate.admit():
+            return
+        self.data_buffer.add_data(self.sensor_type, value)
+        readings = self.gate.persist([("value", value, None)])
+        if readings:
+            self.db_service.save_sensor_batch(self.sensor.storage_target, readings)
+        logger.debug(f"Received {self.sensor_type} value: {value}")
+
+    def pause(self):
+        self.flowing.clear()
+        logger.warning(f"Pausing {self.sensor_type} TCP senders")
+
+    def resume(self):
+        self.flowing.set()
+        logger.info(f"Resuming {self.sensor_type} TCP senders")
+
+    async def handle_connection(self, reader, writer):
+        """Read frames from one sender until it disconnects"""
+        addr = writer.get_extra_info('peername')
+        logger.info(f"New {self.sensor_type} connection from {addr}")
+        size = self.decoder.size
+        pending = b""
+        
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                await self.flowing.wait()
+                
+                # Decode every complete frame, keep the remainder for the next read
+                pending += data
+                complete = len(pending) - len(pending) % size
+                for value in self.decoder.decode_many(pending[:complete]):
+                    try:
+                        self.process_value(value)
+                    except Exception as e:
+                        logger.error(f"Error processing {self.sensor_type} data: {e}")
+                pending = pending[complete:]
+        except Exception as e:
+            logger.error(f"Error handling {self.sensor_type} connection: {e}")
+        finally:
+            writer.close()
+            logger.info(f"{self.sensor_type} connection closed")
+
+    async def start(self):
+        """Start listening on the running event loop"""
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        logger.info(f"Starting {self.sensor_type} TCP listener on {self.host}:{self.port}")
+        return self.server
\ No newline at end of file
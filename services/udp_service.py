@@ -0,0 +1,198 @@
+"""
+UDP listener for fire-and-forget sensors such as temperature and gas
+"""
+import asyncio
+import socket
+import time
+from struct import Struct
+from config.settings import Settings
+from utils.decoders import FRAME_DECODERS
+from services.overload import SensorGate
+from utils.metrics import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every datagram starts with a big-endian uint32 sequence number per sender
+SEQUENCE = Struct('!I')
+SEQUENCE_MODULO = 1 << 32
+
+class SourceStats:
+    def __init__(self, sequence: int):
+        self.last_seen = time.monotonic()
+        self.last_sequence = sequence
+        self.received = 1
+        self.lost = 0
+        self.reordered = 0
+
+    def update(self, sequence: int):
+        """Account for a datagram, counting gaps as losses until late arrivals fill them"""
+        self.last_seen = time.monotonic()
+        self.received += 1
+        gap = (sequence - self.last_sequence) % SEQUENCE_MODULO
+        if gap == 0:
+            self.reordered += 1  # duplicate
+        elif gap < SEQUENCE_MODULO // 2:
+            self.lost += gap - 1
+            self.last_sequence = sequence
+        else:
+            # Older than the newest seen: a late datagram previously counted as lost
+            self.reordered += 1
+            if self.lost:
+                self.lost -= 1
+
+    def as_dict(self) -> dict:
+        return {
+            'received': self.received,
+            'lost': self.lost,
+            'reordered': self.reordered,
+            'last_sequence': self.last_sequence
+        }
+
+class AsyncUDPServer:
+    def __init__(self, sensor, data_buffer, db_service, overload=None):
+        """
+        Initialize a UDP listener for a registry-declared sensor
+
+        Args:
+            sensor: SensorConfig with port, decoder and storage target
+            data_buffer: DataBuffer instance for storing readings
+            db_service: StorageWriter (or DatabaseService) the readings are saved through
+            overload (optional): OverloadController deciding what is shed
+        """
+        self.sensor = sensor
+        self.sensor_type = sensor.name
+        self.data_buffer = data_buffer
+        self.db_service = db_service
+        self.decoder = FRAME_DECODERS[sensor.decoder]
+        self.host = sensor.host or Settings.TCP_HOST
+        self.port = sensor.port
+        self.sources = {}  # (host, port) -> SourceStats, evicted after Settings.UDP_SOURCE_IDLE
+        self.next_eviction = time.monotonic() + Settings.UDP_SOURCE_IDLE
+        self.malformed = 0
+        self.gate = SensorGate(sensor.name, sensor.priority, sensor.rollup, overload)
+        self.loop = None
+
+        # Preallocated receive area: one slot per datagram drained in a wakeup
+        self.batch = Settings.UDP_BATCH
+        self.slot_size = Settings.UDP_MAX_DATAGRAM
+        self.buffer = bytearray(self.batch * self.slot_size)
+        self.view = memoryview(self.buffer)
+        self.received = [(0, None)] * self.batch
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, Settings.UDP_RECV_BUFFER)
+        self.sock.bind((self.host, self.port))
+        self.sock.setblocking(False)
+
+        logger.info(f"UDP listener initialized for {self.sensor_type} on port {self.port}")
+
+    def drain(self):
+        """
+        Read every queued datagram (up to the batch size) and process them
+
+        Python exposes no recvmmsg binding, so the batch is filled with
+        consecutive recvfrom_into calls into the preallocated slots.
+        """
+        count = 0
+        while count < self.batch:
+            offset = count * self.slot_size
+            try:
+                nbytes, addr = self.sock.recvfrom_into(
+                    self.view[offset:offset + self.slot_size])
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                logger.error(f"Error receiving {self.sensor_type} datagram: {e}")
+                break
+            self.received[count] = (nbytes, addr)
+            count += 1
+
+        readings, seen = [], set()
+        for i in range(count):
+            nbytes, addr = self.received[i]
+            offset = i * self.slot_size
+            if self.process_datagram(self.view[offset:offset + nbytes], addr, readings):
+                seen.add(addr)
+
+        # One save for everything drained in this wakeup
+        try:
+            readings = self.gate.persist(readings)
+            if readings:
+                self.db_service.save_sensor_batch(self.sensor.storage_target, readings)
+        except Exception as e:
+            logger.error(f"Error saving {self.sensor_type} data: {e}")
+        self.publish_stats(seen)
+        if time.monotonic() >= self.next_eviction:
+            self.evict_idle()
+        return count
+
+    def process_datagram(self, datagram, addr, readings: list) -> bool:
+        """
+        Track the sequence number and decode every frame in the datagram
+
+        Args:
+            datagram: Sequence number followed by whole frames
+            addr: Sender address
+            readings (list): Admitted (value_type, value, timestamp) tuples are appended here
+
+        Returns:
+            bool: False if the datagram was malformed
+        """
+        payload_size = len(datagram) - SEQUENCE.size
+        if payload_size <= 0 or payload_size % self.decoder.size:
+            self.malformed += 1
+            metrics.inc(f'udp.{self.sensor_type}.malformed')
+            return False
+
+        sequence = SEQUENCE.unpack_from(datagram)[0]
+        stats = self.sources.get(addr)
+        if stats is None:
+            self.sources[addr] = SourceStats(sequence)
+        else:
+            stats.update(sequence)
+
+        for value in self.decoder.decode_many(datagram[SEQUENCE.size:]):
+            if not self.gate.admit():
+                continue
+            self.data_buffer.add_data(self.sensor_type, value)
+            readings.append(("value", value, None))
+        return True
+
+    def publish_stats(self, addresses):
+        """Expose per-source loss accounting as udp.<sensor>.<host>:<port>.* gauges"""
+        for addr in addresses:
+            source = f"udp.{self.sensor_type}.{addr[0]}:{addr[1]}"
+            for name, value in self.sources[addr].as_dict().items():
+                metrics.set_gauge(f"{source}.{name}", value)
+
+    def evict_idle(self, now: float = None):
+        """
+        Forget senders that went quiet
+
+        Senders restart on new ephemeral ports, so without eviction every
+        restart would leave its SourceStats and gauges behind for good.
+        """
+        now = time.monotonic() if now is None else now
+        cutoff = now - Settings.UDP_SOURCE_IDLE
+        for addr in [addr for addr, stats in self.sources.items() if stats.last_seen < cutoff]:
+            del self.sources[addr]
+            metrics.remove_gauges(f"udp.{self.sensor_type}.{addr[0]}:{addr[1]}.")
+        self.next_eviction = now + Settings.UDP_SOURCE_IDLE / 2
+
+    def pause(self):
+        """Stop draining under backpressure; the kernel drops what overflows"""
+        if self.loop is not None:
+            self.loop.remove_reader(self.sock)
+        logger.warning(f"Pausing {self.sensor_type} UDP listener")
+
+    def resume(self):
+        if self.loop is not None:
+            self.loop.add_reader(self.sock, self.drain)
+        logger.info(f"Resuming {self.sensor_type} UDP listener")
+
+    async def start(self):
+        """Start draining the socket from the running event loop"""
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.sock, self.drain)
+        logger.info(f"Starting {self.sensor_type} UDP listener on {self.host}:{self.port}")
@@ -0,0 +1,68 @@
+"""
+Resampling onto a common grid and loading buffered series
+"""
+import numpy as np
+import pytest
+from services.analytics import align_channels, load_buffer, resample
+from utils.data_buffer import DataBuffer
+
+TIMES = np.array([0, 10, 20, 50], dtype=np.int64)
+VALUES = np.array([0.0, 1.0, 2.0, 5.0])
+
+def assert_values(result, expected):
+    np.testing.assert_array_equal(result, np.array(expected, dtype=np.float64))
+
+def test_asof_takes_last_sample_within_tolerance():
+    grid = np.array([-5, 0, 5, 10, 29, 35, 60], dtype=np.int64)
+    assert_values(resample(TIMES, VALUES, grid, 'asof', 10),
+                  [np.nan, 0.0, 0.0, 1.0, 2.0, np.nan, 5.0])
+
+def test_nearest_picks_closer_sample():
+    grid = np.array([-5, 4, 6, 35, 36, 70], dtype=np.int64)
+    assert_values(resample(TIMES, VALUES, grid, 'nearest', 15),
+                  [0.0, 0.0, 1.0, 2.0, 5.0, np.nan])
+
+def test_linear_interpolates_between_close_neighbours():
+    grid = np.array([-5, 0, 5, 15, 35, 50, 55], dtype=np.int64)
+    # 35 lies 15 from both 20 and 50: beyond a tolerance of 10 on both sides
+    assert_values(resample(TIMES, VALUES, grid, 'linear', 10),
+                  [np.nan, 0.0, 0.5, 1.5, np.nan, 5.0, np.nan])
+
+def test_linear_needs_both_neighbours_within_tolerance():
+    times = np.array([0, 100], dtype=np.int64)
+    values = np.array([0.0, 10.0])
+    grid = np.array([5, 50, 95], dtype=np.int64)
+    # Close to one side only is not enough
+    assert_values(resample(times, values, grid, 'linear', 10), [np.nan, np.nan, np.nan])
+    assert_values(resample(times, values, grid, 'linear', 100), [0.5, 5.0, 9.5])
+
+def test_empty_channel_and_unknown_method():
+    grid = np.array([0, 1], dtype=np.int64)
+    empty = np.array([], dtype=np.int64)
+    assert_values(resample(empty, np.array([]), grid, 'asof', 10), [np.nan, np.nan])
+    with pytest.raises(ValueError):
+        resample(TIMES, VALUES, grid, 'cubic', 10)
+
+def test_load_buffer_splits_axes():
+    buffer = DataBuffer()
+    for i in range(3):
+        buffer.add_data('imu_acc', (float(i), 10.0 + i, 20.0 + i), timestamp=100.0 + i)
+        buffer.add_data('temperature', 20.0 + i, timestamp=100.5 + i)
+
+    series = load_buffer(buffer, ['imu_acc', 'temperature'])
+    assert sorted(series) == ['imu_acc.0', 'imu_acc.1', 'imu_acc.2', 'temperature']
+    times, values = series['imu_acc.1']
+    assert times.tolist() == [100000000, 101000000, 102000000]
+    assert values.tolist() == [10.0, 11.0, 12.0]
+    assert list(load_buffer(buffer, ['imu_acc.2'])) == ['imu_acc.2']
+
+    table = align_channels(['imu_acc.0', 'temperature'], step=1.0, method='asof',
+                           source='buffer', data_buffer=buffer)
+    assert table.columns['imu_acc.0'].tolist() == [0.0, 1.0, 2.0]
+
+def test_load_buffer_rejects_mixed_values():
+    buffer = DataBuffer()
+    buffer.add_data('imu_gyro', 1.0)
+    buffer.add_data('imu_gyro', (1.0, 2.0, 3.0))
+    with pytest.raises(ValueError):
+        load_buffer(buffer, ['imu_gyro'])
@@ -0,0 +1,58 @@
+"""
+Round trips through the Gorilla block codec
+"""
+import math
+import random
+from datetime import datetime, timedelta
+from utils.gorilla import (decode_block, decode_block_columns, encode_block,
+                           from_micros, to_micros)
+
+START = datetime(2024, 3, 1, 12, 0, 0)
+
+def assert_round_trip(samples):
+    block = encode_block(samples)
+    decoded = decode_block(block, len(samples))
+    assert [timestamp for timestamp, _ in decoded] == [timestamp for timestamp, _ in samples]
+    for (_, value), (_, expected) in zip(decoded, samples):
+        assert value == expected or (math.isnan(value) and math.isnan(expected))
+    return block
+
+def test_regular_series_compresses():
+    samples = [(START + timedelta(seconds=i), 21.5) for i in range(1000)]
+    block = assert_round_trip(samples)
+    # Two bits per sample once the first delta is known
+    assert len(block) < 300
+
+def test_every_delta_of_delta_bucket():
+    # Jitter sized to hit the 7, 12, 20 and 64 bit buckets, including negatives
+    offsets = [0, 1, 2, 50, 3000, -2000, 400000, -300000, 10 ** 10, 10 ** 10 + 1]
+    timestamp, delta, samples = START, timedelta(seconds=1), []
+    for i, jitter in enumerate(offsets):
+        delta += timedelta(microseconds=jitter)
+        timestamp += delta
+        samples.append((timestamp, float(i)))
+    assert_round_trip(samples)
+
+def test_value_edge_cases():
+    values = [0.0, -0.0, 1.0, -1.0, 1e-308, 5e-324, 1.7976931348623157e308,
+              float('inf'), float('-inf'), float('nan'), 0.1, 0.1, 0.30000000000000004]
+    samples = [(START + timedelta(milliseconds=10 * i), value) for i, value in enumerate(values)]
+    assert_round_trip(samples)
+
+def test_random_walk():
+    rng = random.Random(42)
+    value, samples = 20.0, []
+    for i in range(2000):
+        value += rng.uniform(-0.5, 0.5)
+        samples.append((START + timedelta(microseconds=i * 100000 + rng.randint(0, 999)), value))
+    assert_round_trip(samples)
+
+def test_columns_and_edges():
+    assert decode_block_columns(b'', 0) == ([], [])
+    assert_round_trip([(START, 3.25)])
+
+    samples = [(START + timedelta(seconds=i), float(i)) for i in range(5)]
+    timestamps, values = decode_block_columns(encode_block(samples), len(samples))
+    assert timestamps == [to_micros(timestamp) for timestamp, _ in samples]
+    assert values == [value for _, value in samples]
+    assert from_micros(timestamps[-1]) == samples[-1][0]
@@ -0,0 +1,46 @@
+"""
+Long-poll wakeups in the latest-value cache
+"""
+import asyncio
+from utils.latest_cache import LatestValueCache
+
+async def wait_filtered_and_unfiltered(cache):
+    wakes = []
+    wake = cache._wake
+    cache._wake = lambda future: (wakes.append(future), wake(future))
+
+    version = cache.snapshot(['a'])[0]
+    filtered = [asyncio.create_task(cache.wait_for_change(version, 5, channels=['a', 'c']))
+                for _ in range(100)]
+    unfiltered = asyncio.create_task(cache.wait_for_change(cache.version, 5))
+    await asyncio.sleep(0)
+
+    for i in range(50):
+        cache.update('b', i)
+    await asyncio.sleep(0.01)
+    assert await unfiltered
+    assert len(wakes) == 1
+    assert not any(task.done() for task in filtered)
+
+    cache.update('a', 1.0)
+    assert all(await asyncio.gather(*filtered))
+    assert len(wakes) == 101
+    return cache
+
+def test_updates_wake_only_matching_waiters():
+    cache = LatestValueCache()
+    cache.update('a', 0.0)
+    asyncio.run(wait_filtered_and_unfiltered(cache))
+    # Woken through 'a', the waiters no longer linger under 'c'
+    assert cache.waiters == [] and cache.channel_waiters == {}
+
+def test_timeout_unregisters():
+    cache = LatestValueCache()
+    assert not asyncio.run(cache.wait_for_change(cache.version, 0.01, channels=['a']))
+    assert not asyncio.run(cache.wait_for_change(cache.version, 0.01))
+    assert cache.waiters == [] and cache.channel_waiters == {}
+
+def test_stale_version_returns_immediately():
+    cache = LatestValueCache()
+    cache.update('a', 1.0)
+    assert asyncio.run(cache.wait_for_change(0, 5, channels=['a']))
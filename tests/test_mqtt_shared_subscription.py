@@ -0,0 +1,225 @@
+"""
+IMU consumers against a minimal in-process MQTT v5 broker
+
+The broker implements just what the consumers use: CONNECT with properties,
+SUBSCRIBE, QoS 1 PUBLISH/PUBACK, PINGREQ and $share/<group>/<filter>
+subscriptions, delivering each message to one group member in turn.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from struct import unpack_from
+from config.settings import Settings
+from services.ipc_service import IPCReceiver
+from services.mqtt_service import IMUClient, consumer_client_id
+from services.sinks import IPCSink
+from utils.data_buffer import DataBuffer
+from utils.metrics import metrics
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 12, 13, 14
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, value = value % 128, value // 128
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+def decode_varint(data: bytes, offset: int):
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset
+
+def packet(kind: int, flags: int, body: bytes) -> bytes:
+    return bytes([kind << 4 | flags]) + encode_varint(len(body)) + body
+
+def string(text: str) -> bytes:
+    data = text.encode()
+    return len(data).to_bytes(2, 'big') + data
+
+def read_string(data: bytes, offset: int):
+    length = int.from_bytes(data[offset:offset + 2], 'big')
+    return data[offset + 2:offset + 2 + length].decode(), offset + 2 + length
+
+def matches(topic_filter: str, topic: str) -> bool:
+    if topic_filter.endswith('/#'):
+        return topic == topic_filter[:-2] or topic.startswith(topic_filter[:-1])
+    return topic_filter == topic
+
+class Broker:
+    def __init__(self):
+        self.connects = []  # (client id, protocol level, clean start, session expiry)
+        self.subscriptions = []  # (filter, writer)
+        self.groups = {}  # (group, filter) -> [writer], delivered round robin
+        self.turn = {}
+        self.next_packet_id = 1
+        self.unacked = set()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length, multiplier = 0, 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7f) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                self.dispatch(header >> 4, body, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def dispatch(self, kind: int, body: bytes, writer):
+        if kind == CONNECT:
+            _, offset = read_string(body, 0)
+            level, flags = body[offset], body[offset + 1]
+            offset += 4
+            properties_length, offset = decode_varint(body, offset)
+            properties = body[offset:offset + properties_length]
+            expiry = unpack_from('>I', properties, 1)[0] if properties[:1] == b'\x11' else None
+            client_id, _ = read_string(body, offset + properties_length)
+            self.connects.append((client_id, level, bool(flags & 0x02), expiry))
+            writer.write(packet(CONNACK, 0, b'\x00\x00\x00'))
+        elif kind == SUBSCRIBE:
+            packet_id = body[:2]
+            properties_length, offset = decode_varint(body, 2)
+            topic_filter, _ = read_string(body, offset + properties_length)
+            if topic_filter.startswith('$share/'):
+                _, group, topic_filter = topic_filter.split('/', 2)
+                self.groups.setdefault((group, topic_filter), []).append(writer)
+            else:
+                self.subscriptions.append((topic_filter, writer))
+            writer.write(packet(SUBACK, 0, packet_id + b'\x00\x01'))
+        elif kind == PUBACK:
+            self.unacked.discard(int.from_bytes(body[:2], 'big'))
+        elif kind == PINGREQ:
+            writer.write(packet(PINGRESP, 0, b''))
+        elif kind == DISCONNECT:
+            writer.close()
+
+    def publish(self, topic: str, payload: bytes):
+        targets = [writer for topic_filter, writer in self.subscriptions
+                   if matches(topic_filter, topic)]
+        for (group, topic_filter), members in self.groups.items():
+            if matches(topic_filter, topic):
+                turn = self.turn.get(group, 0)
+                targets.append(members[turn % len(members)])
+                self.turn[group] = turn + 1
+
+        for writer in targets:
+            packet_id = self.next_packet_id
+            self.next_packet_id += 1
+            self.unacked.add(packet_id)
+            body = string(topic) + packet_id.to_bytes(2, 'big') + b'\x00' + payload
+            writer.write(packet(PUBLISH, 0x02, body))
+
+class RecordingWriter:
+    def __init__(self):
+        self.batches = []
+
+    def save_sensor_batch(self, sensor_type, readings):
+        self.batches.append((sensor_type, list(readings)))
+
+    def readings(self, prefix: str = '') -> list:
+        return [reading for _, readings in self.batches for reading in readings
+                if reading[0].startswith(prefix)]
+
+class CountingSink(IPCSink):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.datagrams = 0
+        self.samples = 0
+
+    def submit_samples(self, name, device, samples):
+        self.datagrams += 1
+        self.samples += len(samples)
+        super().submit_samples(name, device, samples)
+
+async def wait_until(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+async def run_consumers(port: int, socket_path: str, messages: int):
+    broker = Broker()
+    server = await asyncio.start_server(broker.handle, '127.0.0.1', port)
+
+    collector_buffer = DataBuffer()
+    for suffix in ('acc', 'gyro', 'orientation'):
+        collector_buffer.register(f"imu_{suffix}")
+    collector_writer, consumer_writer = RecordingWriter(), RecordingWriter()
+    collector = IMUClient(collector_buffer, collector_writer, index=0)
+    receiver = IPCReceiver([], None, socket_path, imu_clients={'imu': collector})
+    await receiver.start()
+    forward = CountingSink(socket_path)
+    consumer = IMUClient(DataBuffer(), consumer_writer, index=1, forward=forward)
+
+    tasks = [asyncio.create_task(client.run_async()) for client in (collector, consumer)]
+    try:
+        await wait_until(lambda: sum(len(members) for members in broker.groups.values()) == 2)
+        for i in range(messages):
+            payload = json.dumps([[0.0, 0.0, 1.0], [0.0, 0.0, 10.0]]).encode()
+            broker.publish('sensors/imu/device1', payload)
+            await asyncio.sleep(0.01)
+        await wait_until(lambda: not broker.unacked)
+        await wait_until(lambda: len(collector_buffer.get_data('imu_orientation')) == messages)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        receiver.close()
+        server.close()
+    return broker, collector, collector_writer, consumer_writer, collector_buffer, forward
+
+def test_shared_subscription_splits_storage_and_fuses_in_one_place(monkeypatch):
+    monkeypatch.setattr(Settings, 'MQTT_HOST', '127.0.0.1')
+    monkeypatch.setattr(Settings, 'MQTT_PORT', 18883)
+    monkeypatch.setattr(Settings, 'MQTT_SHARE_GROUP', 'imu-ingest')
+    monkeypatch.setattr(Settings, 'IMU_FUSION_MAX_DELAY', 0.3)
+    monkeypatch.setattr(Settings, 'IMU_FORWARD_MAX_DELAY', 0.1)
+    monkeypatch.setattr(Settings, 'BUFFER_SIZE', 1000)
+    messages = 20
+
+    with tempfile.TemporaryDirectory() as directory:
+        broker, collector, collector_writer, consumer_writer, buffer, forward = asyncio.run(
+            run_consumers(Settings.MQTT_PORT, os.path.join(directory, 'ingest.sock'), messages))
+
+    # Persistent MQTT v5 sessions under stable ids, subscribed through the share group
+    assert sorted(connect[0] for connect in broker.connects) == [
+        consumer_client_id('imu', 0, 'imu-ingest'), consumer_client_id('imu', 1, 'imu-ingest')]
+    for _, level, clean_start, expiry in broker.connects:
+        assert (level, clean_start, expiry) == (5, False, Settings.MQTT_SESSION_EXPIRY)
+    assert list(broker.groups) == [('imu-ingest', 'sensors/imu/#')]
+
+    # Each message is stored once, by whichever consumer the broker picked
+    collector_raw = len(collector_writer.readings('acc_x'))
+    consumer_raw = len(consumer_writer.readings('acc_x'))
+    assert collector_raw + consumer_raw == messages
+    assert collector_raw and consumer_raw
+
+    # The other consumer forwards its samples in fusion batches, not one by one
+    assert forward.samples == consumer_raw
+    assert forward.datagrams < forward.samples
+    # ...and the collector holds its own samples back long enough to merge them
+    assert metrics.snapshot()['counters'].get('mqtt.imu.late_samples', 0) == 0
+
+    # The collector buffers and fuses every sample, with one filter state per device
+    assert buffer.get_data('imu_acc') == [(0.0, 0.0, 1.0)] * messages
+    assert len(collector_writer.readings('yaw')) == messages
+    assert consumer_writer.readings('yaw') == []
+    assert list(collector.orientation_filter.states) == ['sensors/imu/device1']
+
+    # Yaw integrates 10 deg/s over the whole stream, not just one consumer's half
+    yaw = [value for _, value, _ in collector_writer.readings('yaw')]
+    assert yaw == sorted(yaw)
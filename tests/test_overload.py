@@ -0,0 +1,124 @@
+"""
+Overload mode transitions and per-sensor shedding
+"""
+from config.settings import Settings
+from services.overload import (BACKPRESSURE, DECIMATE, NORMAL, ROLLUP,
+                               OverloadController, SensorGate)
+
+class FakeDatabase:
+    def __init__(self):
+        self.commit_latency = {}
+        self.last_commit = {}
+        self.spool = None
+
+class FakeWriter:
+    depth = 0
+
+class Listener:
+    def __init__(self):
+        self.paused = False
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+def controller():
+    writer = FakeWriter()
+    return OverloadController(FakeDatabase(), writer), writer
+
+def test_escalates_immediately_and_steps_down_after_cooldown():
+    overload, writer = controller()
+    low, high = Listener(), Listener()
+    overload.register(low)
+    overload.register(high, priority='high')
+
+    writer.depth = Settings.OVERLOAD_WRITE_QUEUE[2]
+    overload.evaluate(now=100.0)
+    assert overload.mode == BACKPRESSURE
+    assert low.paused and not high.paused
+    assert overload.rejecting('normal') and not overload.rejecting('high')
+
+    # Signals drop to normal: one level per cooldown, never straight down
+    writer.depth = 0
+    cooldown = Settings.OVERLOAD_COOLDOWN
+    overload.evaluate(now=101.0)
+    overload.evaluate(now=101.0 + cooldown / 2)
+    assert overload.mode == BACKPRESSURE
+    overload.evaluate(now=101.0 + cooldown)
+    assert overload.mode == ROLLUP and not low.paused
+    overload.evaluate(now=101.0 + 2 * cooldown)
+    assert overload.mode == DECIMATE
+    overload.evaluate(now=101.0 + 3 * cooldown)
+    assert overload.mode == NORMAL
+
+def test_renewed_pressure_resets_cooldown():
+    overload, writer = controller()
+    writer.depth = Settings.OVERLOAD_WRITE_QUEUE[1]
+    overload.evaluate(now=0.5)
+    assert overload.mode == ROLLUP
+
+    writer.depth = 0
+    overload.evaluate(now=1.0)
+    writer.depth = Settings.OVERLOAD_WRITE_QUEUE[1]
+    overload.evaluate(now=2.0)
+    writer.depth = 0
+    overload.evaluate(now=3.0)
+    overload.evaluate(now=1.0 + Settings.OVERLOAD_COOLDOWN)
+    assert overload.mode == ROLLUP
+
+def test_stale_commit_latency_is_ignored():
+    overload, _ = controller()
+    database = overload.db_service
+    database.commit_latency['gas'] = Settings.OVERLOAD_COMMIT_LATENCY[2]
+    database.last_commit['gas'] = 1000.0
+
+    assert overload.signals(now=1000.5)['commit_latency'] == Settings.OVERLOAD_COMMIT_LATENCY[2]
+    overload.evaluate(now=1000.5)
+    assert overload.mode == BACKPRESSURE
+
+    # Writers paused, nothing commits: the old latency must not hold the mode
+    stale = 1000.0 + Settings.OVERLOAD_LATENCY_STALE
+    assert overload.signals(now=stale)['commit_latency'] == 0.0
+
+def test_registering_during_backpressure_pauses():
+    overload, writer = controller()
+    writer.depth = Settings.OVERLOAD_WRITE_QUEUE[2]
+    overload.evaluate(now=0.5)
+    listener = Listener()
+    overload.register(listener)
+    assert listener.paused
+
+def test_gate_decimates_low_priority_only():
+    overload, _ = controller()
+    overload.mode = DECIMATE
+    low = SensorGate('imu', 'low', controller=overload)
+    normal = SensorGate('gas', 'normal', controller=overload)
+    admitted = sum(low.admit() for _ in range(10 * Settings.OVERLOAD_DECIMATION))
+    assert admitted == 10
+    assert all(normal.admit() for _ in range(10))
+    assert all(SensorGate('imu', 'low').admit() for _ in range(10))
+
+def test_gate_rolls_up_and_flushes(monkeypatch):
+    overload, _ = controller()
+    gate = SensorGate('temperature', 'normal', rollup=True, controller=overload)
+    assert gate.persist([('value', 1.0, None)]) == [('value', 1.0, None)]
+
+    clock = [1000.0]
+    monkeypatch.setattr('services.overload.time.time', lambda: clock[0])
+    overload.mode = ROLLUP
+    assert gate.persist([('value', 1.0, None), ('value', 3.0, None)]) == []
+    clock[0] += Settings.OVERLOAD_ROLLUP_WINDOW
+    completed = gate.persist([('value', 10.0, None)])
+    assert [(value_type, value) for value_type, value, _ in completed] == [('value', 2.0)]
+
+    # Back to normal: the open window is flushed ahead of the new readings
+    overload.mode = NORMAL
+    readings = gate.persist([('value', 5.0, None)])
+    assert [value for _, value, _ in readings] == [10.0, 5.0]
+    assert gate.windows == {}
+
+    high = SensorGate('gas', 'high', rollup=True, controller=overload)
+    overload.mode = ROLLUP
+    assert high.persist([('value', 1.0, None)]) == [('value', 1.0, None)]
@@ -0,0 +1,112 @@
+"""
+Spool segments: CRC checks, torn tails and replay into a flaky database
+"""
+import os
+from datetime import datetime, timedelta
+from config.settings import Settings
+from services.spool import HEADER, Spool, SpoolReplayer
+
+START = datetime(2024, 3, 1, 12, 0, 0)
+
+class FakeDatabase:
+    UNAVAILABLE_ERRORS = (ConnectionError,)
+
+    def __init__(self, fail_after: int = None, rejected=()):
+        self.rows = []
+        self.available = True
+        self.fail_after = fail_after  # inserts before the database goes away
+        self.rejected = set(rejected)  # values the database refuses
+        self.inserts = 0
+
+    def is_available(self, sensor_type: str) -> bool:
+        return self.available
+
+    def insert_batch(self, sensor_type: str, readings):
+        if self.fail_after is not None and self.inserts >= self.fail_after:
+            raise ConnectionError("database went away")
+        self.inserts += 1
+        if any(value in self.rejected for _, value, _ in readings):
+            raise ValueError("rejected")
+        self.rows.extend((sensor_type, value) for _, value, _ in readings)
+
+def fill(spool, count: int, sensor_type: str = 'gas'):
+    for i in range(count):
+        spool.append(sensor_type, None, float(i), START + timedelta(seconds=i))
+    spool.seal()
+    return spool.sealed_segments()[-1]
+
+def test_records_round_trip(tmp_path):
+    spool = Spool(str(tmp_path))
+    path = fill(spool, 3)
+    assert spool.read_segment(path) == [
+        ('gas', None, float(i), START + timedelta(seconds=i)) for i in range(3)]
+    # A reopened spool picks up where the last one left off
+    reopened = Spool(str(tmp_path))
+    assert reopened.total_bytes == os.path.getsize(path)
+    assert reopened.next_segment == spool.next_segment
+
+def test_crc_mismatch_stops_reading(tmp_path):
+    spool = Spool(str(tmp_path))
+    path = fill(spool, 3)
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    first = HEADER.size + HEADER.unpack_from(data)[0]
+    data[first + HEADER.size] ^= 0xFF  # flip a payload byte of the second record
+    with open(path, 'wb') as f:
+        f.write(data)
+    assert [record[2] for record in spool.read_segment(path)] == [0.0]
+
+def test_torn_tail_is_dropped(tmp_path):
+    spool = Spool(str(tmp_path))
+    path = fill(spool, 3)
+    size = os.path.getsize(path)
+    for cut in (size - 1, size - HEADER.size - 5, size - 3 * HEADER.size):
+        with open(path, 'rb') as f:
+            data = f.read()[:cut]
+        truncated = str(tmp_path / 'torn.bin')
+        with open(truncated, 'wb') as f:
+            f.write(data)
+        assert [record[2] for record in spool.read_segment(truncated)] == [0.0, 1.0]
+
+def test_replay_inserts_and_removes(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, 'SPOOL_REPLAY_BATCH', 4)
+    spool = Spool(str(tmp_path))
+    path = fill(spool, 10)
+    database = FakeDatabase()
+    assert SpoolReplayer(spool, database).replay_segment(path)
+    assert [value for _, value in database.rows] == [float(i) for i in range(10)]
+    assert spool.segments() == [] and spool.total_bytes == 0
+
+def test_replay_waits_for_database(tmp_path):
+    spool = Spool(str(tmp_path))
+    path = fill(spool, 3)
+    database = FakeDatabase()
+    database.available = False
+    assert not SpoolReplayer(spool, database).replay_segment(path)
+    assert spool.segments() == [path]
+    assert SpoolReplayer(spool, database).ready([]) and not SpoolReplayer(spool, database).ready(['gas'])
+
+def test_replay_bisects_rejected_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, 'SPOOL_REPLAY_BATCH', 8)
+    spool = Spool(str(tmp_path))
+    path = fill(spool, 16)
+    database = FakeDatabase(rejected={5.0, 12.0})
+    assert SpoolReplayer(spool, database).replay_segment(path)
+    assert sorted(value for _, value in database.rows) == [
+        float(i) for i in range(16) if i not in (5, 12)]
+
+def test_outage_mid_replay_requeues_durably(tmp_path, monkeypatch):
+    monkeypatch.setattr(Settings, 'SPOOL_REPLAY_BATCH', 4)
+    monkeypatch.setattr(Settings, 'SPOOL_FSYNC_RECORDS', 10 ** 6)
+    monkeypatch.setattr(Settings, 'SPOOL_FSYNC_INTERVAL', 10 ** 6)
+    spool = Spool(str(tmp_path))
+    path = fill(spool, 10)
+    database = FakeDatabase(fail_after=1)
+    assert SpoolReplayer(spool, database).replay_segment(path)
+    assert [value for _, value in database.rows] == [0.0, 1.0, 2.0, 3.0]
+
+    # The original segment is gone, but the rest is on disk in the active one
+    assert path not in spool.segments()
+    assert spool.unsynced == 0
+    assert [record[2] for record in spool.read_segment(spool.active_path)] == [
+        float(i) for i in range(4, 10)]
@@ -1,26 +1,53 @@
 """
 Data buffer management using thread-safe deque
 """
+import time
 from collections import deque
 from threading import Lock
 from config.settings import Settings
+from utils.latest_cache import LatestValueCache
 
 class DataBuffer:
-    def __init__(self):
+    def __init__(self, cache: LatestValueCache = None):
         self.buffer_size = Settings.BUFFER_SIZE
+        # Latest values for read endpoints, fed by every add_data call
+        self.cache = cache if cache is not None else LatestValueCache()
         self.buffers = {
             'humidity': deque(maxlen=self.buffer_size),
             'temperature': deque(maxlen=self.buffer_size),
             'gas': deque(maxlen=self.buffer_size),
             'imu_acc': deque(maxlen=self.buffer_size),
-            'imu_gyro': deque(maxlen=self.buffer_size)
+            'imu_gyro': deque(maxlen=self.buffer_size),
+            'imu_orientation': deque(maxlen=self.buffer_size)
         }
+        # Arrival time of every buffered value, for time-aligned reads
+        self.timestamps = {key: deque(maxlen=self.buffer_size) for key in self.buffers.keys()}
         self.locks = {key: Lock() for key in self.buffers.keys()}
     
-    def add_data(self, sensor_type: str, data):
+    def register(self, sensor_type: str):
+        """Create a buffer for a sensor declared at runtime"""
+        if sensor_type not in self.buffers:
+            self.locks[sensor_type] = Lock()
+            self.buffers[sensor_type] = deque(maxlen=self.buffer_size)
+            self.timestamps[sensor_type] = deque(maxlen=self.buffer_size)
+    
+    def add_data(self, sensor_type: str, data, timestamp: float = None):
+        timestamp = timestamp or time.time()
         with self.locks[sensor_type]:
             self.buffers[sensor_type].append(data)
+            self.timestamps[sensor_type].append(timestamp)
+        self.cache.update(sensor_type, data, timestamp)
     
     def get_data(self, sensor_type: str):
         with self.locks[sensor_type]:
-            return list(self.buffers[sensor_type])
\ No newline at end of file
+            return list(self.buffers[sensor_type])
+    
+    def get_series(self, sensor_type: str):
+        """
+        Buffered values with their arrival times
+        
+        Returns:
+            tuple: (timestamps list in epoch seconds, values list), oldest first
+        """
+        with self.locks[sensor_type]:
+            return list(self.timestamps[sensor_type]), list(self.buffers[sensor_type])
\ No newline at end of file
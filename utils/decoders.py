@@ -0,0 +1,34 @@
+"""
+Frame decoders shared by the sensor listeners
+"""
+from struct import Struct
+
+class StructDecoder:
+    def __init__(self, fmt: str):
+        """
+        Decoder for fixed-size binary frames holding a single value
+        
+        Args:
+            fmt (str): struct format of one frame, e.g. 'f' for a float32
+        """
+        self.struct = Struct(fmt)
+        self.size = self.struct.size
+    
+    def decode(self, frame: bytes) -> float:
+        return self.struct.unpack(frame)[0]
+    
+    def decode_many(self, data) -> list:
+        """Decode a buffer holding a whole number of frames"""
+        return [values[0] for values in self.struct.iter_unpack(data)]
+
+# Decoders for stream and datagram protocols
+FRAME_DECODERS = {
+    'float32': StructDecoder('f'),
+    'float64': StructDecoder('d')
+}
+
+# Decoders for message protocols, handled by the HTTP and MQTT services
+MESSAGE_DECODERS = {
+    'http': {'json'},
+    'mqtt': {'imu_json'}
+}
@@ -0,0 +1,216 @@
+"""
+Gorilla-style compression for time series blocks
+
+Timestamps are stored as delta-of-delta values and readings as the XOR of
+consecutive IEEE-754 doubles, so slowly changing sensor values collapse to a
+handful of bits per sample.
+"""
+import struct
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+
+# Delta-of-delta buckets: (control bits, control bit count, payload bits)
+DOD_BUCKETS = [
+    (0b10, 2, 7),
+    (0b110, 3, 12),
+    (0b1110, 4, 20),
+]
+DOD_FALLBACK = (0b1111, 4, 64)
+
+
+def to_micros(timestamp: datetime) -> int:
+    """Convert a naive UTC datetime to microseconds since the epoch"""
+    return (timestamp - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(micros: int) -> datetime:
+    """Convert microseconds since the epoch to a naive UTC datetime"""
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def float_to_bits(value: float) -> int:
+    return struct.unpack('>Q', struct.pack('>d', value))[0]
+
+
+def bits_to_float(bits: int) -> float:
+    return struct.unpack('>d', struct.pack('>Q', bits))[0]
+
+
+class BitWriter:
+    def __init__(self):
+        self.out = bytearray()
+        self.acc = 0
+        self.nbits = 0
+
+    def write(self, value: int, nbits: int):
+        """Append the lowest nbits of value"""
+        self.acc = (self.acc << nbits) | (value & ((1 << nbits) - 1))
+        self.nbits += nbits
+        while self.nbits >= 8:
+            self.nbits -= 8
+            self.out.append((self.acc >> self.nbits) & 0xFF)
+        self.acc &= (1 << self.nbits) - 1
+
+    def getvalue(self) -> bytes:
+        if self.nbits:
+            return bytes(self.out) + bytes([(self.acc << (8 - self.nbits)) & 0xFF])
+        return bytes(self.out)
+
+
+class BitReader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+        self.acc = 0
+        self.nbits = 0
+
+    def read(self, nbits: int) -> int:
+        """Read the next nbits as an unsigned integer"""
+        while self.nbits < nbits:
+            if self.pos >= len(self.data):
+                raise ValueError("Unexpected end of compressed block")
+            self.acc = (self.acc << 8) | self.data[self.pos]
+            self.pos += 1
+            self.nbits += 8
+        self.nbits -= nbits
+        value = self.acc >> self.nbits
+        self.acc &= (1 << self.nbits) - 1
+        return value
+
+
+def _sign_extend(value: int, nbits: int) -> int:
+    if value & (1 << (nbits - 1)):
+        return value - (1 << nbits)
+    return value
+
+
+def encode_block(samples) -> bytes:
+    """
+    Compress a sequence of readings
+
+    Args:
+        samples: Iterable of (timestamp, value) tuples ordered by timestamp
+
+    Returns:
+        bytes: The encoded block; the sample count must be stored alongside it
+    """
+    writer = BitWriter()
+    prev_ts = prev_delta = None
+    prev_bits = 0
+    prev_leading = prev_trailing = None
+
+    for timestamp, value in samples:
+        ts = to_micros(timestamp)
+        bits = float_to_bits(float(value))
+
+        if prev_ts is None:
+            writer.write(ts, 64)
+            writer.write(bits, 64)
+            prev_ts, prev_delta, prev_bits = ts, 0, bits
+            continue
+
+        # Timestamp: delta-of-delta
+        delta = ts - prev_ts
+        dod = delta - prev_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for control, control_bits, payload_bits in DOD_BUCKETS:
+                limit = 1 << (payload_bits - 1)
+                if -limit <= dod < limit:
+                    writer.write(control, control_bits)
+                    writer.write(dod, payload_bits)
+                    break
+            else:
+                control, control_bits, payload_bits = DOD_FALLBACK
+                writer.write(control, control_bits)
+                writer.write(dod, payload_bits)
+        prev_ts, prev_delta = ts, delta
+
+        # Value: XOR with previous
+        xor = bits ^ prev_bits
+        if xor == 0:
+            writer.write(0, 1)
+        else:
+            leading = min(64 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if (prev_leading is not None and leading >= prev_leading
+                    and trailing >= prev_trailing):
+                writer.write(0b10, 2)
+                writer.write(xor >> prev_trailing, 64 - prev_leading - prev_trailing)
+            else:
+                meaningful = 64 - leading - trailing
+                writer.write(0b11, 2)
+                writer.write(leading, 5)
+                writer.write(meaningful & 0x3F, 6)  # 64 is stored as 0
+                writer.write(xor >> trailing, meaningful)
+                prev_leading, prev_trailing = leading, trailing
+        prev_bits = bits
+
+    return writer.getvalue()
+
+
+def decode_block_columns(data: bytes, count: int):
+    """
+    Decompress a block produced by encode_block into separate columns
+
+    Args:
+        data (bytes): Encoded block
+        count (int): Number of samples in the block
+
+    Returns:
+        tuple: (microsecond timestamps list, values list) in the original order
+    """
+    if count == 0:
+        return [], []
+
+    reader = BitReader(data)
+    ts = reader.read(64)
+    bits = reader.read(64)
+    timestamps = [ts]
+    values = [bits_to_float(bits)]
+    delta = 0
+    leading = trailing = 0
+
+    for _ in range(count - 1):
+        # Timestamp
+        if reader.read(1) == 0:
+            dod = 0
+        else:
+            # Control prefix is unary: 10, 110, 1110, 1111
+            payload_bits = DOD_FALLBACK[2]
+            for _, _, bucket_bits in DOD_BUCKETS:
+                if reader.read(1) == 0:
+                    payload_bits = bucket_bits
+                    break
+            dod = _sign_extend(reader.read(payload_bits), payload_bits)
+        delta += dod
+        ts += delta
+
+        # Value
+        if reader.read(1) == 1:
+            if reader.read(1) == 1:
+                leading = reader.read(5)
+                meaningful = reader.read(6) or 64
+                trailing = 64 - leading - meaningful
+            bits ^= reader.read(64 - leading - trailing) << trailing
+        timestamps.append(ts)
+        values.append(bits_to_float(bits))
+
+    return timestamps, values
+
+
+def decode_block(data: bytes, count: int):
+    """
+    Decompress a block produced by encode_block
+
+    Args:
+        data (bytes): Encoded block
+        count (int): Number of samples in the block
+
+    Returns:
+        list: (timestamp, value) tuples in the original order
+    """
+    timestamps, values = decode_block_columns(data, count)
+    return [(from_micros(ts), value) for ts, value in zip(timestamps, values)]
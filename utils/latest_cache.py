@@ -0,0 +1,154 @@
+"""
+Latest-value cache for read endpoints, fed by the ingest path
+"""
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from threading import Lock
+from config.settings import Settings
+
+class LatestValueCache:
+    def __init__(self, window: int = None):
+        """
+        Initialize cache holding the latest value and a short window per channel
+
+        Args:
+            window (int, optional): Recent values kept per channel,
+                defaults to Settings.CACHE_WINDOW
+        """
+        self.window = window or Settings.CACHE_WINDOW
+        self.lock = Lock()
+        self.channels = {}
+        self.version = 0
+        # Versions restart with the process; the boot id keeps old ETags from matching
+        self.boot_id = uuid.uuid4().hex[:12]
+        self.waiters = []  # (loop, future) of long-polling readers of the whole cache
+        self.channel_waiters = {}  # channel -> (loop, future) of readers filtering on it
+
+        # Serialized snapshot, rebuilt at most once per version
+        self._snapshot_version = -1
+        self._snapshot_body = b""
+
+    def update(self, channel: str, value, timestamp: float = None):
+        """Record a new reading; called from any ingest thread"""
+        timestamp = timestamp or time.time()
+        with self.lock:
+            entry = self.channels.get(channel)
+            if entry is None:
+                entry = self.channels[channel] = {
+                    'value': None,
+                    'timestamp': None,
+                    'recent': deque(maxlen=self.window),
+                    'version': 0
+                }
+            self.version += 1
+            entry['value'] = value
+            entry['timestamp'] = timestamp
+            entry['recent'].append(value)
+            entry['version'] = self.version
+            waiters, self.waiters = self.waiters, []
+            waiters.extend(self.channel_waiters.pop(channel, ()))
+
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(self._wake, future)
+
+    @staticmethod
+    def _wake(future):
+        if not future.done():
+            future.set_result(True)
+
+    def _entry_dict(self, entry) -> dict:
+        return {
+            'value': entry['value'],
+            'timestamp': datetime.utcfromtimestamp(entry['timestamp']).isoformat(),
+            'recent': list(entry['recent'])
+        }
+
+    def etag(self, version: int) -> str:
+        return f'"{self.boot_id}-{version}"'
+
+    def _version_of(self, channels=None) -> int:
+        """Version of the whole cache, or of the last update to any of channels"""
+        if not channels:
+            return self.version
+        return max((self.channels[name]['version'] for name in channels
+                    if name in self.channels), default=0)
+
+    def snapshot(self, channels=None):
+        """
+        Current state of the cache
+
+        Args:
+            channels (list, optional): Restrict to these channels; the version
+                then only moves when one of them is updated
+
+        Returns:
+            tuple: (version, JSON body as bytes)
+        """
+        with self.lock:
+            if channels:
+                version = self._version_of(channels)
+                body = json.dumps({
+                    'version': version,
+                    'channels': {name: self._entry_dict(self.channels[name])
+                                 for name in channels if name in self.channels}
+                }).encode()
+                return version, body
+
+            if self._snapshot_version != self.version:
+                self._snapshot_body = json.dumps({
+                    'version': self.version,
+                    'channels': {name: self._entry_dict(entry)
+                                 for name, entry in self.channels.items()}
+                }).encode()
+                self._snapshot_version = self.version
+            return self.version, self._snapshot_body
+
+    async def wait_for_change(self, version: int, timeout: float, channels=None) -> bool:
+        """
+        Wait until the cache (or one of channels) moves past version
+
+        Args:
+            version (int): Version the caller already has
+            timeout (float): Maximum seconds to wait
+            channels (list, optional): Only wake for updates to these channels
+
+        Returns:
+            bool: True if the cache changed, False on timeout
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self.lock:
+            if self._version_of(channels) != version:
+                return True
+            if channels:
+                for name in channels:
+                    self.channel_waiters.setdefault(name, []).append(waiter)
+            else:
+                self.waiters.append(waiter)
+
+        try:
+            # Only the whole cache or the watched channels wake the future
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self.lock:
+                self._unregister(waiter, channels)
+
+    def _unregister(self, waiter, channels=None):
+        """Drop a waiter that may still be listed under channels that did not wake it"""
+        if not channels:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            return
+        for name in channels:
+            waiters = self.channel_waiters.get(name)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self.channel_waiters.pop(name, None)
@@ -0,0 +1,30 @@
+"""
+Process-wide counters and gauges exposed by the read API
+"""
+from threading import Lock
+
+class Metrics:
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = {}
+        self.gauges = {}
+
+    def inc(self, name: str, amount: float = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        with self.lock:
+            self.gauges[name] = value
+
+    def remove_gauges(self, prefix: str):
+        with self.lock:
+            for name in [name for name in self.gauges if name.startswith(prefix)]:
+                del self.gauges[name]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {'counters': dict(self.counters), 'gauges': dict(self.gauges)}
+
+# Shared registry for the collector process
+metrics = Metrics()